@@ -0,0 +1,316 @@
+"""
+    Module, that defines benchmarks of the game engine.
+
+    Run: python bench.py [--output results.json] [--compare baseline.json] [--threshold 0.15] [names...]
+    Results are written as JSON (operations per second for every benchmark and
+    spread -- interquartile range of timing windows relative to the median one).
+    In comparison mode benchmarks, which became slower than baseline by more
+    than threshold (widened by the bigger spread of two runs, but not more than
+    by MAX_WIDENING), are reported as regressions (exit code 1). Baseline must
+    be made by the same version of benchmarks, Python and machine (else exit code 2).
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+# simulation imports table, which must be imported before player
+from simulation import HeadlessTable, Bot, CallStrategy, RandomStrategy, StrengthStrategy
+from deck import Deck
+from player import Player, Combination
+from evaluator import evaluate, combination_id, np
+from card import make_card, SUITS
+
+if np is not None:
+    from evaluator import evaluate_batch
+
+VERSION = 3
+CORPUS_SIZE = 200
+SEED = 2024
+MAX_WIDENING = 0.25     # the biggest widening of threshold by noise of timing
+
+
+# Fixed corpora of hands (7 cards) for every combination
+
+# function, that returns hand with given cards and random others
+def _fill(rng, cards, size=7):
+    rest = [card for card in range(52) if card not in cards]
+    return cards + rng.sample(rest, size - len(cards))
+
+
+# functions, that build hands of rare combinations
+def _royal_flush(rng):
+    suit = rng.choice(SUITS)
+    return _fill(rng, [make_card(suit, value) for value in range(10, 15)])
+
+def _straight_flush(rng):
+    suit, high = rng.choice(SUITS), rng.randint(5, 13)
+    return _fill(rng, [make_card(suit, value) for value in range(high - 4, high + 1)])
+
+def _four_of_a_kind(rng):
+    value = rng.randint(2, 14)
+    return _fill(rng, [make_card(suit, value) for suit in SUITS])
+
+def _full_house(rng):
+    first, second = rng.sample(range(2, 15), 2)
+    return _fill(rng, [make_card(suit, first) for suit in rng.sample(SUITS, 3)] +
+                      [make_card(suit, second) for suit in rng.sample(SUITS, 2)])
+
+BUILDERS = {
+    10 : _royal_flush,
+    9 : _straight_flush,
+    8 : _four_of_a_kind,
+    7 : _full_house,
+    }
+
+
+# function, that returns {combination id: [hands]}, the same for every run
+def hand_corpora(size=CORPUS_SIZE, seed=SEED):
+    rng = random.Random(seed)
+    corpora = {combination : [] for combination in Combination.COMBINATIONS}
+
+    while any(len(hands) < size for combination, hands in corpora.items() if combination not in BUILDERS):
+        hand = rng.sample(range(52), 7)
+        hands = corpora[combination_id(evaluate(hand))]
+        if len(hands) < size:
+            hands.append(hand)
+
+    for combination, builder in BUILDERS.items():
+        hands = corpora[combination] = []
+        while len(hands) < size:
+            hand = builder(rng)
+            if combination_id(evaluate(hand)) == combination:
+                hands.append(hand)
+
+    return corpora
+
+
+# Timing
+
+# function, that runs function number times in every of repeat timing windows
+# (window is at least min_time seconds) after warm-up.
+# operations -- count of operations in one call of function,
+# setup -- function, that prepares argument of every call (it isn't timed).
+# Returns pair (operations per second of the median window, spread)
+def measure(function, operations=1, number=None, repeat=5, min_time=0.2, setup=None):
+    def window(number):
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+        else:
+            arguments = [setup() for _ in range(number)]
+            start = time.perf_counter()
+            for argument in arguments:
+                function(argument)
+        return time.perf_counter() - start
+
+    # warm-up (caches, lazy tables), then number is chosen for window of min_time
+    window(1)
+    if number is None:
+        number = 1
+        while (elapsed := window(number)) < min_time:
+            number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+    return _summary([operations * number / window(number) for _ in range(repeat)])
+
+
+# function, that returns (median, spread) of rates of timing windows.
+# Spread -- interquartile range / median, it shows noise of timing on this machine
+# (single outlier windows don't change it)
+def _summary(rates):
+    rates = sorted(rates)
+    median = rates[len(rates) // 2]
+    return median, (rates[len(rates) * 3 // 4] - rates[len(rates) // 4]) / median
+
+
+# Benchmarks, every function returns {name: (operations per second, spread)}
+
+def bench_find_combination():
+    results = {}
+    player = Player("bench", 0)
+
+    for combination, hands in hand_corpora().items():
+        def run():
+            for hand in hands:
+                player.find_combination(hand)
+        name = Combination.COMBINATIONS[combination].lower().replace(" ", "_")
+        results[f"find_combination.{name}"] = measure(run, len(hands))
+
+    return results
+
+
+def bench_evaluate_batch():
+    if np is None:
+        return {}
+
+    rng = np.random.default_rng(SEED)
+    hands = np.argsort(rng.random((100000, 52)), axis=1)[:, :7]
+    return {"evaluate_batch" : measure(lambda: evaluate_batch(hands), len(hands))}
+
+
+def bench_deck():
+    rng = random.Random(SEED)
+    deck = Deck(rng)
+
+    def deal():
+        deck.reset()
+        for _ in range(11):         # 3 players and board
+            deck.pop()
+
+    return {
+        "deck.construct" : measure(lambda: Deck(rng)),
+        "deck.deal_hand" : measure(deal),
+    }
+
+
+def _players_with_combinations(count, rng):
+    players = []
+    for index in range(count):
+        player = Player(f"Player {index}", 0)
+        player.find_combination(rng.sample(range(52), 7))
+        players.append(player)
+    return players
+
+
+def bench_combinations():
+    rng = random.Random(SEED)
+    players = _players_with_combinations(1000, rng)
+    combinations = [player.combination for player in players]
+    pairs = list(zip(combinations, combinations[1:]))
+    tables = [players[index:index + 9] for index in range(0, len(players), 9)]
+
+    def compare():
+        for first, second in pairs:
+            first > second
+
+    def find_max():
+        for players_list in tables:
+            Combination.find_max(players_list)
+
+    return {
+        "combination.compare" : measure(compare, len(pairs)),
+        "combination.find_max_9" : measure(find_max, len(tables)),
+    }
+
+
+def bench_show_winner():
+    rng = random.Random(SEED)
+    stacks = [100 * (index + 1) for index in range(9)]      # 9 all-ins -- 9 pots
+
+    # tables with 9 all-ins and full board are built outside of timing
+    def setup():
+        players = [Player(f"Player {index}", stack) for index, stack in enumerate(stacks)]
+        headless = HeadlessTable(10, *players, rng=rng)
+        for player in players:
+            player.cards = [headless.deck.pop(), headless.deck.pop()]
+            player.do_raise(headless, all_in=True)
+        for _ in range(5):
+            headless.deal_card()
+        return headless
+
+    return {"table.settle_9_way_all_in" : measure(lambda headless: headless.pay_winners(), setup=setup)}
+
+
+def bench_headless():
+    rng = random.Random(SEED)
+    strategies = [CallStrategy(), RandomStrategy(random.Random(SEED)), StrengthStrategy()]
+
+    # tables are short-lived (players are kicked), so hands are counted, not calls.
+    # Every window -- 0.2 seconds of play, the first one is warm-up
+    rates = []
+    for _ in range(6):
+        hands = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < 0.2:
+            bots = [Bot(f"Bot {index}", 1000, strategies[index % len(strategies)]) for index in range(6)]
+            hands += HeadlessTable(10, *bots, rng=rng).play(200)
+        rates.append(hands / (time.perf_counter() - start))
+
+    return {"headless.hands" : _summary(rates[1:])}
+
+
+BENCHMARKS = {
+    "find_combination" : bench_find_combination,
+    "evaluate_batch" : bench_evaluate_batch,
+    "deck" : bench_deck,
+    "combinations" : bench_combinations,
+    "show_winner" : bench_show_winner,
+    "headless" : bench_headless,
+    }
+
+def run(names=None):
+    results = {}
+    spreads = {}
+    for name, benchmark in BENCHMARKS.items():
+        if not names or name in names:
+            for result, (value, spread) in benchmark().items():
+                results[result] = value
+                spreads[result] = spread
+
+    return {
+        "version" : VERSION,
+        "python" : platform.python_version(),
+        "machine" : platform.machine(),
+        "results" : results,
+        "spreads" : spreads,
+    }
+
+
+# function, that returns list of (name, baseline, current, change) for slower benchmarks.
+# Allowed slowdown of benchmark -- threshold plus the bigger spread of two runs (noise of timing),
+# widening is not more than MAX_WIDENING. Raises ValueError, if runs can't be compared
+def compare(baseline, current, threshold=0.15):
+    for field in ("version", "python", "machine"):
+        if baseline.get(field) != current[field]:
+            raise ValueError(f"Baseline has other {field}: {baseline.get(field)} (current: {current[field]})")
+
+    regressions = []
+    for name, value in current["results"].items():
+        base = baseline["results"].get(name)
+        noise = max(baseline["spreads"].get(name, 0.0), current["spreads"][name])
+        allowed = threshold + min(noise, MAX_WIDENING)
+        if base and value < base * (1 - allowed):
+            regressions.append((name, base, value, value / base - 1))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the poker engine")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--output", help="file for results (JSON)")
+    parser.add_argument("--compare", help="baseline file (JSON) for finding regressions")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed slowdown (0.15 -- 15%%) in addition to noise of timings")
+    args = parser.parse_args(argv)
+
+    current = run(args.names)
+    for name, value in current["results"].items():
+        print(f"{name:40} {value:15,.0f} ops/s  (spread {current['spreads'][name]:.1%})")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(current, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+        try:
+            regressions = compare(baseline, current, args.threshold)
+        except ValueError as error:
+            print(f"Can't compare with {args.compare}: {error}")
+            return 2
+        for name, base, value, change in regressions:
+            print(f"REGRESSION {name}: {base:,.0f} -> {value:,.0f} ops/s ({change:+.1%})")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+    Module, that maps cards to canonical form by suit isomorphism.
+
+    Spots, which differ only by renaming of suits, are equal for evaluation
+    and equity (22100 flops -- 1755 canonical ones). Cards are given by groups
+    (for example, hole cards and board), order of cards inside group doesn't
+    matter. Every suit has signature -- rank masks of its cards in every group;
+    suits are renamed in order of their signatures, so equal spots get equal
+    canonical form. Suits with equal signatures are interchangeable, so the
+    order between them doesn't matter.
+    Cards are ints (see card module), renaming of suit is a table lookup.
+"""
+
+from itertools import permutations
+
+from card import SUIT_MASK, DECK_SIZE
+from evaluator import RANK_BITS
+
+SUITS_COUNT = 4
+
+# all permutations of suits: permutation[old suit] = new suit,
+# CARD_MAPS[permutation][card] -- card with renamed suit
+PERMUTATIONS = tuple(permutations(range(SUITS_COUNT)))
+CARD_MAPS = {permutation : tuple(card & ~SUIT_MASK | permutation[card & SUIT_MASK] for card in range(DECK_SIZE))
+             for permutation in PERMUTATIONS}
+INVERSE = {permutation : tuple(permutation.index(suit) for suit in range(SUITS_COUNT)) for permutation in PERMUTATIONS}
+
+
+# function, that returns permutation of suits (permutation[old suit] = new suit),
+# which makes groups of cards canonical
+def canonical_permutation(*groups):
+    signatures = [[0] * len(groups) for _ in range(SUITS_COUNT)]
+    for index, group in enumerate(groups):
+        for card in group:
+            signatures[card & SUIT_MASK][index] |= RANK_BITS[card]
+
+    # the "richest" suit becomes the first one
+    order = sorted(range(SUITS_COUNT), key=lambda suit: signatures[suit], reverse=True)
+    permutation = [0] * SUITS_COUNT
+    for new, old in enumerate(order):
+        permutation[old] = new
+    return tuple(permutation)
+
+
+# function, that renames suits of cards by permutation
+def apply(cards, permutation):
+    card_map = CARD_MAPS[permutation]
+    return [card_map[card] for card in cards]
+
+
+def inverse(permutation):
+    return INVERSE[permutation]
+
+
+# function, that returns (canonical groups, permutation).
+# Canonical group -- sorted tuple of cards; cards of canonical form are mapped back
+# by apply(cards, inverse(permutation))
+def canonicalize(*groups):
+    permutation = canonical_permutation(*groups)
+    card_map = CARD_MAPS[permutation]
+    return tuple(tuple(sorted(card_map[card] for card in group)) for group in groups), permutation
+
+
+# canonical form of groups without permutation (key for caches)
+def canonical_key(*groups):
+    return canonicalize(*groups)[0]
+
+
+# function, that returns canonical form of hole cards of player and table cards
+def canonical_spot(player, table):
+    return canonicalize(player.cards, table.table_cards)
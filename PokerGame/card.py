@@ -1,5 +1,10 @@
 """ 
-    Module, that defines class Card and some constants for correct working with it
+    Module, that defines class Card and some constants for correct working with it.
+
+    Cards inside the game are plain ints from 0 to 51:
+        card = (value - 2) << 2 | suit index (in SUITS)
+    so bits 0-1 are a suit and bits 2-5 are a rank. Card objects are
+    interned views of these ints and used only for displaying.
 """
 
 SUITS = ("spades", "hearts", "clubs", "diamonds")
@@ -132,4 +137,70 @@ class Card:
         return self.__value < other.__value
 
     def __le__(self, other):
-        return self.__value <= other.__value
\ No newline at end of file
+        return self.__value <= other.__value
+
+
+# integer card representation
+SUIT_BITS = 2
+SUIT_MASK = 0b11
+DECK_SIZE = 52
+
+
+def make_card(suit, value):
+    # suit -- str from SUITS, value -- 2..14 (ace can be 1 or 14)
+    if suit not in SUITS:
+        raise ValueError("Suit is incorrect")
+    if value == 1:
+        value = 14
+    if not 2 <= value <= 14:
+        raise ValueError("Value of card is incorrect")
+    return (value - 2) << SUIT_BITS | SUITS.index(suit)
+
+
+class CardView(Card):
+    """
+        Read-only card. Views are interned and shared by all the game,
+        so suit and value can't be changed
+    """
+
+    suit = property(Card.suit.fget)
+    value = property(Card.value.fget)
+
+
+# interned views of cards and of values without suit
+CARD_VIEWS = tuple(CardView(SUITS[card & SUIT_MASK], (card >> SUIT_BITS) + 2) for card in range(DECK_SIZE))
+RANK_VIEWS = {value : CardView('default', value) for value in VALUES_STR}
+
+
+def view(card):
+    return CARD_VIEWS[card]
+
+
+def card_name(card):
+    return CARD_VIEWS[card].short_name
+
+
+RANK_LETTERS = "23456789TJQKA"
+SUIT_LETTERS = "shcd"           # in order of SUITS
+
+
+# function, that returns card (int) by short text name ("As", "Td", "10h")
+def parse_card(text):
+    text = text.strip()
+    rank, suit = text[:-1].upper().replace("10", "T"), text[-1:].lower()
+
+    if len(rank) != 1 or rank not in RANK_LETTERS or not suit or suit not in SUIT_LETTERS:
+        raise ValueError(f"Incorrect card: {text}")
+    return RANK_LETTERS.index(rank) << SUIT_BITS | SUIT_LETTERS.index(suit)
+
+
+# function, that returns list of cards from text ("AsKd", "As Kd", "As,Kd")
+def parse_cards(text):
+    text = text.replace(",", " ")
+    cards = []
+    for part in text.split():
+        while part:
+            size = 3 if part.startswith("10") else 2
+            cards.append(parse_card(part[:size]))
+            part = part[size:]
+    return cards
@@ -1,22 +1,26 @@
 """
     Module, that defines class deck for working with deck of cards.
-    Needs card module. 
+    Needs card module. Deck contains cards as ints (see card module).
 """
 
 import card
 import random
-from itertools import product
 
 class Deck:
     """
        Class, that contains methods for correct working with deck of cards.
+       Deck is allocated once and dealt lazily (partial Fisher-Yates shuffle):
+       every pop swaps a random card of not dealt part to its beginning,
+       so only dealt cards are shuffled. Reset is O(1).
+       * rng -- random.Random (or other object with randrange), for reproducible games
        
     """
 
     # Constructor
-    def __init__(self):
-        self.__deck = [card.Card(suit, value) for suit, value in product(card.SUITS, card.VALUES_STR) if value != 1]
-        random.shuffle(self.__deck)
+    def __init__(self, rng=None):
+        self.__deck = list(range(card.DECK_SIZE))
+        self.__rng = rng if rng is not None else random.Random()
+        self.__dealt = 0
                 
 
     # String representation
@@ -24,21 +28,36 @@ class Deck:
         return "Deck object"
 
     def __str__(self):
-        return self.__deck
+        return str(self.remaining())
 
     def print_deck(self):
         for item in self:
-            print(item)
+            print(card.view(item))
 
 
-    # Iterable interface
+    # Iterable interface (not dealt cards)
     def __getitem__(self, value):
-        return self.__deck[value]
+        return self.__deck[self.__dealt:][value]
 
     def __len__(self):
-        return len(self.__deck)
+        return card.DECK_SIZE - self.__dealt
+
+    def remaining(self):
+        return self.__deck[self.__dealt:]
+
+    # return all cards to deck
+    def reset(self):
+        self.__dealt = 0
 
     # return next card from deck
     def pop(self):
-        return self.__deck.pop()
+        dealt = self.__dealt
+        if dealt == card.DECK_SIZE:
+            raise IndexError("pop from empty deck")
+
+        deck = self.__deck
+        index = self.__rng.randrange(dealt, card.DECK_SIZE)
+        deck[dealt], deck[index] = deck[index], deck[dealt]
+        self.__dealt = dealt + 1
 
+        return deck[dealt]
@@ -0,0 +1,300 @@
+"""
+    Module, that estimates equity of players by sampling run-outs of the board.
+    Cards are ints (see card module).
+"""
+
+import os
+import time
+import random
+from itertools import combinations
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+from card import DECK_SIZE
+from evaluator import evaluate, np, HandState, RANK_KEYS, RANK_BITS, RANK_TABLE, FLUSH_TABLE
+from card import SUIT_MASK
+
+if np is not None:
+    from evaluator import evaluate_batch, shared_tables, attach_tables
+
+BOARD_SIZE = 5
+CHUNK_SIZE = 10000      # samples, after which time budget is checked (at least one chunk is done)
+
+
+class EquityResult:
+    """
+        Equity of one player:
+        - win -- probability to win alone
+        - tie -- probability to split the bank
+        - equity -- share of the bank, that player gets on average
+        - interval -- confidence interval of equity (low, high)
+        - samples -- count of run-outs
+    """
+
+    def __init__(self, win, tie, equity, interval, samples):
+        self.win = win
+        self.tie = tie
+        self.equity = equity
+        self.interval = interval
+        self.samples = samples
+
+    def __repr__(self):
+        return f"EquityResult(win={self.win:.4f}, tie={self.tie:.4f}, equity={self.equity:.4f}, samples={self.samples})"
+
+    def __str__(self):
+        return f"{self.equity * 100:.1f}%"
+
+
+# Accumulator of sampled results, workers return them and they are merged
+class _Totals:
+    def __init__(self, players):
+        self.samples = 0
+        self.wins = [0] * players
+        self.ties = [0] * players
+        self.shares = [0.0] * players           # sum of shares of the bank
+        self.squares = [0.0] * players          # sum of squares of shares
+
+    def merge(self, other):
+        self.samples += other.samples
+        for index in range(len(self.wins)):
+            self.wins[index] += other.wins[index]
+            self.ties[index] += other.ties[index]
+            self.shares[index] += other.shares[index]
+            self.squares[index] += other.squares[index]
+
+    # confidence -- None, if results are exact
+    def results(self, confidence):
+        z = NormalDist().inv_cdf((1 + confidence) / 2) if confidence else 0.0
+        results = []
+
+        for index in range(len(self.wins)):
+            mean = self.shares[index] / self.samples
+            variance = max(self.squares[index] / self.samples - mean * mean, 0.0)
+            error = z * (variance / self.samples) ** 0.5
+            results.append(EquityResult(self.wins[index] / self.samples,
+                                        self.ties[index] / self.samples,
+                                        mean,
+                                        (max(mean - error, 0.0), min(mean + error, 1.0)),
+                                        self.samples))
+        return results
+
+
+# function, that adds results of one chunk (strengths -- players x samples)
+def _count_numpy(totals, strengths):
+    best = strengths.max(axis=0)
+    winners = strengths == best
+    count = winners.sum(axis=0)
+    shares = winners / count
+
+    for index in range(len(totals.wins)):
+        totals.wins[index] += int((winners[index] & (count == 1)).sum())
+        totals.ties[index] += int((winners[index] & (count > 1)).sum())
+        totals.shares[index] += float(shares[index].sum())
+        totals.squares[index] += float((shares[index] ** 2).sum())
+    totals.samples += strengths.shape[1]
+
+
+def _sample_numpy(hands, board, deck, samples, seed, deadline):
+    rng = np.random.default_rng(seed)
+    missing = BOARD_SIZE - len(board)
+    deck = np.array(deck, dtype=np.intp)
+    totals = _Totals(len(hands))
+
+    while samples > 0:
+        size = min(samples, CHUNK_SIZE)
+
+        # random run-outs, rows with repeated cards are sampled again
+        indexes = rng.integers(0, len(deck), size=(size, missing))
+        repeated = np.arange(size)
+        while repeated.size:
+            ordered = np.sort(indexes[repeated], axis=1)
+            repeated = repeated[(ordered[:, 1:] == ordered[:, :-1]).any(axis=1)]
+            indexes[repeated] = rng.integers(0, len(deck), size=(repeated.size, missing))
+
+        boards = np.concatenate((np.broadcast_to(np.array(board, dtype=np.intp), (size, len(board))), deck[indexes]), axis=1)
+        strengths = np.stack([evaluate_batch(np.concatenate((boards, np.broadcast_to(np.array(hand, dtype=np.intp), (size, 2))), axis=1))
+                              for hand in hands])
+        _count_numpy(totals, strengths)
+        samples -= size
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+    return totals
+
+
+def _sample_python(hands, board, deck, samples, seed, deadline):
+    rng = random.Random(seed)
+    missing = BOARD_SIZE - len(board)
+    totals = _Totals(len(hands))
+
+    while samples > 0:
+        for _ in range(min(samples, CHUNK_SIZE)):
+            full_board = board + rng.sample(deck, missing)
+            strengths = [evaluate(full_board + hand) for hand in hands]
+            best = max(strengths)
+            count = strengths.count(best)
+
+            for index, strength in enumerate(strengths):
+                if strength == best:
+                    if count == 1:
+                        totals.wins[index] += 1
+                    else:
+                        totals.ties[index] += 1
+                    totals.shares[index] += 1 / count
+                    totals.squares[index] += 1 / count ** 2
+            totals.samples += 1
+        samples -= CHUNK_SIZE
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+
+    return totals
+
+
+# worker function, each worker has own seed (independent stream)
+def _sample(hands, board, deck, samples, seed, time_budget):
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+
+    if np is not None:
+        return _sample_numpy(hands, board, deck, samples, seed, deadline)
+    return _sample_python(hands, board, deck, samples, seed, deadline)
+
+
+# function, that returns cards, which are not known
+def remaining_deck(*known):
+    used = set()
+    for cards in known:
+        used.update(cards)
+
+    if len(used) != sum(len(cards) for cards in known):
+        raise ValueError("Same card is used twice")
+
+    return [card for card in range(DECK_SIZE) if card not in used]
+
+
+# function, that returns cards, which can come to the board (board -- the first of known cards).
+# Raises ValueError, if there are less of them, than the board needs
+def run_out_deck(board, *known):
+    deck = remaining_deck(board, *known)
+    if len(deck) < BOARD_SIZE - len(board):
+        raise ValueError("Not enough cards left for the board")
+    return deck
+
+
+# function, that estimates equity by sampling run-outs
+# hands -- list of hole cards of players (2 ints each), board -- 0-5 table cards,
+# dead -- known cards, that can't come (for example, cards of passed players)
+# samples -- budget of run-outs, time_budget -- seconds (or None)
+# processes -- count of workers (tasks for executor -- existing pool, if it's given)
+# returns list of EquityResult in order of hands
+def monte_carlo(hands, board=(), dead=(), samples=100000, time_budget=None,
+                processes=1, executor=None, seed=None, confidence=0.95):
+    hands = [list(hand) for hand in hands]
+    board = list(board)
+    if len(board) > BOARD_SIZE:
+        raise ValueError("Too much table cards")
+    if samples < 1:
+        raise ValueError("At least one sample is needed")
+    deck = run_out_deck(board, dead, *hands)
+
+    if len(board) == BOARD_SIZE:
+        samples = 1         # nothing to sample
+
+    # independent seeds for every worker
+    processes = processes or os.cpu_count()
+    if np is not None:
+        seeds = [int(sequence.generate_state(1)[0]) for sequence in np.random.SeedSequence(seed).spawn(processes)]
+    else:
+        master = random.Random(seed)
+        seeds = [master.getrandbits(64) for _ in range(processes)]
+
+    budgets = [samples // processes + (index < samples % processes) for index in range(processes)]
+    totals = _Totals(len(hands))
+
+    if processes == 1 and executor is None:
+        totals.merge(_sample(hands, board, deck, samples, seeds[0], time_budget))
+        return totals.results(confidence)
+
+    # workers of own pool attach to one memory-mapped copy of batch tables
+    if executor is not None:
+        pool = executor
+    elif np is not None:
+        pool = ProcessPoolExecutor(max_workers=processes, initializer=attach_tables, initargs=(shared_tables(),))
+    else:
+        pool = ProcessPoolExecutor(max_workers=processes)
+    try:
+        futures = [pool.submit(_sample, hands, board, deck, budget, worker_seed, time_budget)
+                   for budget, worker_seed in zip(budgets, seeds) if budget]
+        for future in futures:
+            totals.merge(future.result())
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+    return totals.results(confidence)
+
+
+# function, that counts equity exactly by enumerating all run-outs of the board.
+# State of every player (board + hole cards) is counted once, then only cards of
+# the run-out are added to it. Cheap on the turn (44 run-outs) and flop (~1000).
+# Arguments are the same as in monte_carlo, returns list of EquityResult
+def exact(hands, board=(), dead=()):
+    hands = [list(hand) for hand in hands]
+    board = list(board)
+    if len(board) > BOARD_SIZE:
+        raise ValueError("Too much table cards")
+    deck = run_out_deck(board, dead, *hands)
+
+    states = [HandState(board + hand) for hand in hands]
+    # flushes, which player has without run-out
+    flushes = [max(FLUSH_TABLE[mask] for mask in state.masks) for state in states]
+    totals = _Totals(len(hands))
+    strengths = [0] * len(hands)
+
+    for run_out in combinations(deck, BOARD_SIZE - len(board)):
+        # common part of run-out for all players
+        delta = 0
+        suits = {}
+        for card in run_out:
+            delta += RANK_KEYS[card]
+            suits[card & SUIT_MASK] = suits.get(card & SUIT_MASK, 0) | RANK_BITS[card]
+
+        for index, state in enumerate(states):
+            masks = state.masks
+            strength = RANK_TABLE[state.key + delta]
+            if flushes[index] > strength:
+                strength = flushes[index]
+            for suit, bits in suits.items():
+                if FLUSH_TABLE[masks[suit] | bits] > strength:
+                    strength = FLUSH_TABLE[masks[suit] | bits]
+            strengths[index] = strength
+
+        best = max(strengths)
+        count = strengths.count(best)
+        for index, strength in enumerate(strengths):
+            if strength == best:
+                if count == 1:
+                    totals.wins[index] += 1
+                else:
+                    totals.ties[index] += 1
+                totals.shares[index] += 1 / count
+                totals.squares[index] += 1 / count ** 2
+        totals.samples += 1
+
+    return totals.results(None)
+
+
+# function, that estimates equity of players, who are in the game on the table.
+# After the flop equity is counted exactly, before it -- by sampling
+# returns list of pairs (player, EquityResult)
+def table_equity(table, **kwargs):
+    players = [player for player in table.players if player.answer.passed != True]
+    dead = [card for player in table.players if player.answer.passed for card in player.cards]
+    hands = [player.cards for player in players]
+
+    if len(table.table_cards) >= 3:
+        results = exact(hands, table.table_cards, dead)
+    else:
+        results = monte_carlo(hands, table.table_cards, dead, **kwargs)
+    return list(zip(players, results))
@@ -0,0 +1,403 @@
+"""
+    Module, that defines lookup tables for fast hand evaluation.
+    Cards are ints (see card module).
+
+    Strength of hand is one int, bigger strength -- better hand:
+        combination id (see Combination.COMBINATIONS) << 20
+        + values of deciding cards, 4 bits for each value, most important -- first
+    For example, "Two pairs" of kings and fives with kicker "9" is 0x3d590.
+
+    Tables:
+    - RANK_TABLE -- dict, key is a sum of RANK_KEYS of cards (counts of every rank,
+      3 bits for each rank), value is a strength of the best hand without flushes
+    - FLUSH_TABLE -- list, index is a 13-bit mask of ranks of one suit, value
+      is a strength of flush (or straight flush) for this mask or 0
+
+    Tables can be exported once to binary file (export_tables), then they are
+    loaded from it on import and worker processes attach batch tables to it
+    via memory mapping (attach_tables), so all processes share one copy.
+    File is kept in directory POKERGAME_TABLES_DIR (environment variable) or in
+    user cache directory; if it can't be written, every process builds own tables.
+"""
+
+import os
+import sys
+import mmap
+import struct
+
+from card import SUIT_BITS, SUIT_MASK, DECK_SIZE
+
+COMBINATION_SHIFT = 20
+VALUE_BITS = 4
+VALUE_MASK = 0b1111
+COUNT_BITS = 3
+MAX_CARDS = 7
+
+RANKS_COUNT = 13
+
+# contributions of every card to the rank key and to the rank mask of its suit
+RANK_KEYS = tuple(1 << (COUNT_BITS * (card >> SUIT_BITS)) for card in range(DECK_SIZE))
+RANK_BITS = tuple(1 << (card >> SUIT_BITS) for card in range(DECK_SIZE))
+
+# masks of all straights and their high values, from the biggest one
+STRAIGHTS = tuple((0b11111 << (high - 6), high) for high in range(14, 5, -1)) + \
+            ((1 << 12 | 0b1111, 5),)           # A, 2, 3, 4, 5
+
+
+# function, that packs combination id and values to strength
+def pack(combination, values):
+    strength = combination
+    for index in range(5):
+        strength <<= VALUE_BITS
+        if index < len(values):
+            strength |= values[index]
+    return strength
+
+
+# function, that unpacks strength to combination id and values
+def unpack(strength):
+    values = []
+    for shift in range(COMBINATION_SHIFT - VALUE_BITS, -1, -VALUE_BITS):
+        value = strength >> shift & VALUE_MASK
+        if value:
+            values.append(value)
+    return strength >> COMBINATION_SHIFT, values
+
+
+def combination_id(strength):
+    return strength >> COMBINATION_SHIFT
+
+
+# function, that returns high value of the best straight in 13-bit mask or 0
+def _straight_high(mask):
+    for straight, high in STRAIGHTS:
+        if mask & straight == straight:
+            return high
+    return 0
+
+
+# function, that returns values of the mask, bigger -- first
+def _mask_values(mask):
+    return [index + 2 for index in range(RANKS_COUNT - 1, -1, -1) if mask >> index & 1]
+
+
+def _flush_strength(mask):
+    values = _mask_values(mask)
+    if len(values) < 5:
+        return 0
+
+    high = _straight_high(mask)
+    if high == 14:
+        return pack(10, [high])             # royal flush
+    elif high:
+        return pack(9, [high])              # straight flush
+    return pack(6, values[:5])              # flush
+
+
+# function, that finds the best hand without flushes
+# groups -- {count: [values, bigger -- first]}
+def _rank_strength(groups, mask):
+    quads, trips, pairs, singles = groups[4], groups[3], groups[2], groups[1]
+
+    if quads:
+        kickers = sorted(trips + pairs + singles, reverse=True)
+        return pack(8, quads[:1] + kickers[:1])
+
+    if trips and len(trips) + len(pairs) > 1:
+        pair = max(trips[1:] + pairs)
+        return pack(7, [trips[0], pair])
+
+    high = _straight_high(mask)
+    if high:
+        return pack(5, [high])
+
+    if trips:
+        return pack(4, trips + singles[:2])
+
+    if len(pairs) > 1:
+        kickers = sorted(pairs[2:] + singles, reverse=True)
+        return pack(3, pairs[:2] + kickers[:1])
+
+    if pairs:
+        return pack(2, pairs + singles[:3])
+
+    return pack(1, singles[:5])
+
+
+def _build_rank_table():
+    table = {}
+
+    # goes through ranks from ace to deuce, so values in groups are sorted
+    # groups -- {count: [values]} for all ranks above index
+    def fill(index, left, key, mask, groups):
+        if index < 0:
+            if left < MAX_CARDS:
+                table[key] = _rank_strength(groups, mask)
+            return
+
+        fill(index - 1, left, key, mask, groups)
+
+        for count in range(1, min(4, left) + 1):
+            groups[count].append(index + 2)
+            fill(index - 1, left - count, key + (count << (COUNT_BITS * index)), mask | 1 << index, groups)
+            groups[count].pop()
+
+    fill(RANKS_COUNT - 1, MAX_CARDS, 0, 0, {4 : [], 3 : [], 2 : [], 1 : []})
+    return table
+
+
+# Tables file (little-endian):
+#   header -- magic b"PKEV", version (uint16), HASH_BITS (uint16), count of rank keys (uint64)
+#   1 << HASH_BITS int64 -- rank keys of hash table (-1 -- empty)
+#   1 << HASH_BITS int32 -- strengths of hash table
+#   1 << RANKS_COUNT int32 -- FLUSH_TABLE
+TABLES_MAGIC = b"PKEV"
+TABLES_VERSION = 1
+TABLES_HEADER = struct.Struct("<4sHHQ")
+TABLES_DIR = os.environ.get("POKERGAME_TABLES_DIR") or \
+    os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "PokerGame")
+TABLES_PATH = os.path.join(TABLES_DIR, "evaluator.bin")
+
+# open addressing hash table for rank keys (multiplicative hashing)
+HASH_BITS = 18
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+# function, that maps tables file and returns (map, hash keys, hash strengths, flushes),
+# tables are read-only memoryviews. Raises ValueError, if file isn't correct
+def _map_tables(path):
+    # tables are stored little-endian
+    if sys.byteorder != "little":
+        raise ValueError("Evaluator tables can be mapped only on little-endian machines")
+
+    with open(path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    size = 1 << HASH_BITS
+    magic, version, hash_bits, _ = TABLES_HEADER.unpack_from(data)
+    if magic != TABLES_MAGIC or version != TABLES_VERSION or hash_bits != HASH_BITS:
+        raise ValueError(f"{path} isn't evaluator tables file of version {TABLES_VERSION}")
+    if len(data) != TABLES_HEADER.size + 12 * size + 4 * (1 << RANKS_COUNT):
+        raise ValueError(f"{path} has incorrect size")
+
+    view = memoryview(data)
+    start = TABLES_HEADER.size
+    hash_keys = view[start:start + 8 * size].cast("q")
+    start += 8 * size
+    hash_strengths = view[start:start + 4 * size].cast("i")
+    start += 4 * size
+    return data, hash_keys, hash_strengths, view[start:].cast("i")
+
+
+# function, that loads (FLUSH_TABLE, RANK_TABLE) from tables file or returns None
+def _load_tables(path):
+    try:
+        data, hash_keys, hash_strengths, flushes = _map_tables(path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+    rank_table = {key : strength for key, strength in zip(hash_keys, hash_strengths) if key != -1}
+    flush_table = flushes.tolist()
+    for view in (hash_keys, hash_strengths, flushes):
+        view.release()
+    data.close()
+    return flush_table, rank_table
+
+
+FLUSH_TABLE, RANK_TABLE = _load_tables(TABLES_PATH) or \
+    ([_flush_strength(mask) for mask in range(1 << RANKS_COUNT)], _build_rank_table())
+
+
+# function, that returns strength of the best hand from 1-7 cards (ints).
+# It's HandState(cards).strength() without creating of state (hot path)
+def evaluate(cards):
+    key = 0
+    masks = [0, 0, 0, 0]
+
+    for card in cards:
+        key += RANK_KEYS[card]
+        masks[card & SUIT_MASK] |= RANK_BITS[card]
+
+    strength = RANK_TABLE[key]
+    for mask in masks:
+        if FLUSH_TABLE[mask] > strength:
+            strength = FLUSH_TABLE[mask]
+
+    return strength
+
+
+class HandState:
+    """
+       Class, that contains partial hand state of known cards of player
+       (incremental evaluation: players, outs, exact equity):
+       - key -- counts of ranks (3 bits for every rank)
+       - masks -- [] : ranks of every suit (bitmasks), count of suit -- count of bits
+       Card is added in O(1), strength is counted once after every change
+    """
+
+    __slots__ = ("key", "masks", "count", "_strength")
+
+    def __init__(self, cards=()):
+        self.key = 0
+        self.masks = [0, 0, 0, 0]
+        self.count = 0
+        self._strength = 0
+        for card in cards:
+            self.add(card)
+
+    def __repr__(self):
+        return f"HandState(count={self.count}, strength={self.strength()})"
+
+    def add(self, card):
+        self.key += RANK_KEYS[card]
+        self.masks[card & SUIT_MASK] |= RANK_BITS[card]
+        self.count += 1
+        self._strength = None
+
+    # strength of the best hand from known cards (0 if there are no cards)
+    def strength(self):
+        if self._strength is None:
+            strength = RANK_TABLE[self.key]
+            for mask in self.masks:
+                if FLUSH_TABLE[mask] > strength:
+                    strength = FLUSH_TABLE[mask]
+            self._strength = strength
+        return self._strength
+
+
+# Batch evaluation (needs numpy)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_batch_tables = None
+
+# contributions of every card to the suit key (count of every suit, 4 bits each).
+# Count + 3 has bit 3 set, if count >= 5, so flushes are found with one "and"
+SUIT_KEYS = tuple(1 << (4 * (card & SUIT_MASK)) for card in range(DECK_SIZE))
+SUIT_KEY_BASE = 0x3333
+FLUSH_BITS = 0x8888
+
+
+def _hash_keys(keys):
+    keys = keys.astype(np.uint64) * np.uint64(HASH_MULTIPLIER)
+    return (keys >> np.uint64(64 - HASH_BITS)).astype(np.intp)
+
+
+# function, that makes numpy copies of tables once
+def _get_batch_tables():
+    global _batch_tables
+
+    if _batch_tables is None:
+        if np is None:
+            raise ImportError("numpy is required for batch evaluation")
+
+        size = 1 << HASH_BITS
+        hash_keys = np.full(size, -1, dtype=np.int64)
+        hash_strengths = np.zeros(size, dtype=np.int32)
+
+        keys = list(RANK_TABLE)
+        for key, index in zip(keys, _hash_keys(np.array(keys, dtype=np.int64)).tolist()):
+            while hash_keys[index] != -1:
+                index = (index + 1) & (size - 1)
+            hash_keys[index] = key
+            hash_strengths[index] = RANK_TABLE[key]
+
+        _batch_tables = {
+            "rank_keys" : np.array(RANK_KEYS, dtype=np.int64),
+            "rank_bits" : np.array(RANK_BITS, dtype=np.int32),
+            "suit_keys" : np.array(SUIT_KEYS, dtype=np.int32),
+            "hash_keys" : hash_keys,
+            "hash_strengths" : hash_strengths,
+            "flush" : np.array(FLUSH_TABLE, dtype=np.int32),
+        }
+
+    return _batch_tables
+
+
+# function, that writes tables to file (atomically, so workers never see a part of it)
+def export_tables(path=TABLES_PATH):
+    tables = _get_batch_tables()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        with open(temporary, "wb") as file:
+            file.write(TABLES_HEADER.pack(TABLES_MAGIC, TABLES_VERSION, HASH_BITS, len(RANK_TABLE)))
+            file.write(tables["hash_keys"].astype("<i8").tobytes())
+            file.write(tables["hash_strengths"].astype("<i4").tobytes())
+            file.write(tables["flush"].astype("<i4").tobytes())
+        os.replace(temporary, path)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+# function, that uses memory-mapped tables file for batch evaluation (no copies,
+# pages are shared by all processes). It's initializer of worker processes,
+# path None -- process builds own tables (see shared_tables)
+def attach_tables(path=TABLES_PATH):
+    global _batch_tables
+
+    if np is None or path is None:
+        return
+
+    _, hash_keys, hash_strengths, flushes = _map_tables(path)
+    _batch_tables = {
+        "rank_keys" : np.array(RANK_KEYS, dtype=np.int64),
+        "rank_bits" : np.array(RANK_BITS, dtype=np.int32),
+        "suit_keys" : np.array(SUIT_KEYS, dtype=np.int32),
+        "hash_keys" : np.frombuffer(hash_keys, dtype=np.int64),
+        "hash_strengths" : np.frombuffer(hash_strengths, dtype=np.int32),
+        "flush" : np.frombuffer(flushes, dtype=np.int32),
+    }
+
+
+# function, that returns path of tables file for workers (file is exported, if it's needed)
+# or None, if numpy isn't installed or file can't be written (read-only directory)
+def shared_tables(path=TABLES_PATH):
+    if np is None:
+        return None
+
+    try:
+        _map_tables(path)
+    except (OSError, ValueError, struct.error):
+        try:
+            export_tables(path)
+        except OSError:
+            return None
+    return path
+
+
+# function, that returns strengths of hands
+# hands -- (N, 5..7) array of cards (ints), returns (N,) int32 array
+def evaluate_batch(hands):
+    tables = _get_batch_tables()
+    hands = np.asarray(hands, dtype=np.intp)
+    hash_keys = tables["hash_keys"]
+
+    # strengths without flushes, probing only rows with collisions
+    keys = tables["rank_keys"][hands].sum(axis=1)
+    indexes = _hash_keys(keys)
+    missed = np.flatnonzero(hash_keys[indexes] != keys)
+    while missed.size:
+        indexes[missed] = (indexes[missed] + 1) & (len(hash_keys) - 1)
+        missed = missed[hash_keys[indexes[missed]] != keys[missed]]
+    strengths = tables["hash_strengths"][indexes]
+
+    # flushes (only one suit may have 5+ cards of 7)
+    flush_keys = (tables["suit_keys"][hands].sum(axis=1) + SUIT_KEY_BASE) & FLUSH_BITS
+    rows = np.flatnonzero(flush_keys)
+    if rows.size:
+        suits = np.log2(flush_keys[rows]).astype(np.intp) >> 2
+        flush_hands = hands[rows]
+        # ranks of the same suit are different, so sum of bits == mask
+        masks = np.where(flush_hands & SUIT_MASK == suits[:, None], tables["rank_bits"][flush_hands], 0).sum(axis=1)
+        strengths[rows] = np.maximum(strengths[rows], tables["flush"][masks])
+
+    return strengths
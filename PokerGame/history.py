@@ -0,0 +1,170 @@
+"""
+    Module, that defines append-only binary hand history.
+
+    Every event of a hand is one fixed-width record (16 bytes, little-endian):
+        hand (uint32), kind (uint8), seat (uint8), a (uint8), b (uint8), amount (int64)
+
+    Kinds of records:
+    - HAND_START -- seat: count of players, a: small blind seat, amount: small blind
+    - SEAT -- amount: stack of player at the start of hand
+    - HOLE -- a, b: hole cards of player (ints, see card module)
+    - ACTION -- a: action (FOLD, CHECK, ...), amount: chips added to bank
+    - BOARD -- a: table card
+    - PAYOUT -- amount: chips won by player
+    - HAND_END
+
+    Offsets of HAND_START records (uint64) are written to index file (path + ".idx"),
+    so any hand can be found without reading the whole history.
+"""
+
+import os
+import time
+import struct
+
+RECORD = struct.Struct("<IBBBBq")
+INDEX = struct.Struct("<Q")
+INDEX_SUFFIX = ".idx"
+
+# kinds of records
+HAND_START = 1
+SEAT = 2
+HOLE = 3
+ACTION = 4
+BOARD = 5
+PAYOUT = 6
+HAND_END = 7
+
+# actions
+FOLD = 0
+CHECK = 1
+CALL = 2
+RAISE = 3
+ALL_IN = 4
+SMALL_BLIND = 5
+BIG_BLIND = 6
+
+ACTIONS = {
+    FOLD : "fold",
+    CHECK : "check",
+    CALL : "call",
+    RAISE : "raise",
+    ALL_IN : "all-in",
+    SMALL_BLIND : "small blind",
+    BIG_BLIND : "big blind",
+    }
+
+
+class HandHistoryWriter:
+    """
+       Class, that appends records of hands to file.
+       Records are collected in buffer and written by batches of buffer_size bytes.
+       After a hand, if fsync_interval seconds have passed since the last sync,
+       buffer is written and file is synced to disk.
+       Torn record at the end of file (left by crash) is cut off on open.
+    """
+
+    def __init__(self, path, buffer_size=1 << 16, fsync_interval=1.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.fsync_interval = fsync_interval
+
+        self.__file = open(path, "ab")
+        self.__index = open(path + INDEX_SUFFIX, "ab")
+        self.__buffer = bytearray()
+        self.__index_buffer = bytearray()
+        self.__synced = time.monotonic()
+
+        size = self.__repair()
+
+        # continue numbering of hands after the last record of file
+        self.hand = 0
+        if size >= RECORD.size:
+            with open(path, "rb") as file:
+                file.seek(size - size % RECORD.size - RECORD.size)
+                self.hand = RECORD.unpack(file.read(RECORD.size))[0] + 1
+
+    # function, that cuts off torn record at the end of file and index entries,
+    # which point after the end of file. Returns size of file
+    def __repair(self):
+        size = self.__file.tell()
+        if size % RECORD.size:
+            size -= size % RECORD.size
+            self.__file.truncate(size)
+            self.__file.seek(size)
+
+        with open(self.path + INDEX_SUFFIX, "rb") as file:
+            data = file.read()
+        count = len(data) // INDEX.size
+        while count and INDEX.unpack_from(data, (count - 1) * INDEX.size)[0] >= size:
+            count -= 1
+        if count * INDEX.size != len(data):
+            self.__index.truncate(count * INDEX.size)
+            self.__index.seek(count * INDEX.size)
+        return size
+
+    def __repr__(self):
+        return f"HandHistoryWriter({self.path!r})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def record(self, kind, seat=0, a=0, b=0, amount=0):
+        self.__buffer += RECORD.pack(self.hand, kind, seat, a, b, amount)
+
+        if len(self.__buffer) >= self.buffer_size:
+            self.flush()
+
+    # players -- list of players in order of seats
+    def start_hand(self, smallblind, smallblind_seat, players):
+        self.__index_buffer += INDEX.pack(self.__file.tell() + len(self.__buffer))
+        self.record(HAND_START, len(players), smallblind_seat, 0, smallblind)
+        for player in players:
+            self.record(SEAT, player.seat, amount=player.stack)
+
+    def hole(self, seat, cards):
+        self.record(HOLE, seat, cards[0], cards[1])
+
+    def action(self, seat, action, amount=0):
+        self.record(ACTION, seat, action, 0, amount)
+
+    def board(self, card):
+        self.record(BOARD, 0, card)
+
+    def payout(self, seat, amount):
+        self.record(PAYOUT, seat, amount=amount)
+
+    def end_hand(self):
+        self.record(HAND_END)
+        self.hand += 1
+
+        if time.monotonic() - self.__synced >= self.fsync_interval:
+            self.flush(sync=True)
+
+
+    # write buffer to file (and sync file, if sync is True)
+    def flush(self, sync=False):
+        if self.__buffer:
+            self.__file.write(self.__buffer)
+            self.__buffer.clear()
+        self.__file.flush()
+
+        # index is written after records, so it never points after the end of file
+        if self.__index_buffer:
+            self.__index.write(self.__index_buffer)
+            self.__index_buffer.clear()
+        self.__index.flush()
+
+        if sync:
+            os.fsync(self.__file.fileno())
+            os.fsync(self.__index.fileno())
+            self.__synced = time.monotonic()
+
+    def close(self):
+        if not self.__file.closed:
+            self.flush(sync=True)
+            self.__file.close()
+            self.__index.close()
@@ -0,0 +1,148 @@
+"""
+    Module, that converts stacks to prize equity by Independent Chip Model
+    (Malmuth-Harville): player takes the first place with probability
+    stack / sum of stacks, the next places -- the same way among the others.
+
+    Exact equity is counted by dynamic programming over sets of players, who
+    took the first places (every set once, not every order of places), results
+    are memoized. Big fields are approximated by sampling of finishing orders:
+    order by Exp(1) / stack has the same distribution as Malmuth-Harville.
+"""
+
+import random
+from math import comb
+from functools import lru_cache
+
+from evaluator import np
+
+EXACT_BUDGET = 2000000      # max operations of exact counting (see _exact_cost)
+CHUNK_SIZE = 10000
+
+
+# count of operations of exact counting for players and paid places
+def _exact_cost(players, places):
+    return players * sum(comb(players, taken) for taken in range(min(places, players)))
+
+
+# stacks -- sorted tuple of positive stacks, payouts -- tuple (not longer than stacks)
+@lru_cache(maxsize=4096)
+def _exact(stacks, payouts):
+    total = sum(stacks)
+    equities = [0.0] * len(stacks)
+
+    # sets of players, who took the first places: mask -> (probability, their chips)
+    taken = {0 : (1.0, 0)}
+    for place, prize in enumerate(payouts):
+        last = place + 1 == len(payouts)
+        following = {}
+
+        for mask, (probability, chips) in taken.items():
+            rest = total - chips
+            for player, stack in enumerate(stacks):
+                if mask >> player & 1:
+                    continue
+
+                chance = probability * stack / rest
+                equities[player] += chance * prize
+                if not last:
+                    key = mask | 1 << player
+                    previous = following.get(key)
+                    following[key] = (chance + (previous[0] if previous else 0.0), chips + stack)
+        taken = following
+
+    return tuple(equities)
+
+
+# function, that calls method for positive stacks (sorted, to share memoized results)
+# and splits payouts of the last places between players with zero stacks
+def _split(stacks, payouts, method):
+    stacks = list(stacks)
+    payouts = list(payouts)[:len(stacks)]
+    payouts += [0] * (len(stacks) - len(payouts))
+
+    alive = sorted((stack, index) for index, stack in enumerate(stacks) if stack > 0)
+    busted = [index for index, stack in enumerate(stacks) if stack <= 0]
+
+    equities = [0.0] * len(stacks)
+    if busted:
+        share = sum(payouts[len(alive):]) / len(busted)
+        for index in busted:
+            equities[index] = share
+
+    if alive:
+        results = method(tuple(stack for stack, _ in alive), tuple(payouts[:len(alive)]))
+        for (_, index), equity in zip(alive, results):
+            equities[index] = equity
+    return equities
+
+
+# function, that returns exact prize equities of stacks.
+# payouts -- prizes of places, the first place -- first
+def icm_exact(stacks, payouts):
+    def method(stacks, payouts):
+        # places without prizes don't matter
+        while payouts and not payouts[-1]:
+            payouts = payouts[:-1]
+        return _exact(stacks, payouts)
+
+    return _split(stacks, payouts, method)
+
+
+# function, that returns prize equities by sampling finishing orders
+def icm_sampled(stacks, payouts, samples=100000, seed=None):
+    def method(stacks, payouts):
+        places = len(payouts)
+        if np is not None:
+            return _sample_numpy(stacks, payouts, places, samples, seed)
+        return _sample_python(stacks, payouts, places, samples, seed)
+
+    return _split(stacks, payouts, method)
+
+
+def _sample_numpy(stacks, payouts, places, samples, seed):
+    rng = np.random.default_rng(seed)
+    stacks = np.array(stacks, dtype=np.float64)
+    totals = np.zeros(len(stacks))
+
+    left = samples
+    while left > 0:
+        size = min(left, CHUNK_SIZE)
+        keys = rng.exponential(size=(size, len(stacks))) / stacks
+        if places < len(stacks):
+            top = np.argpartition(keys, places - 1, axis=1)[:, :places]
+            order = np.take_along_axis(top, np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)
+        else:
+            order = np.argsort(keys, axis=1)
+        for place in range(places):
+            totals += np.bincount(order[:, place], minlength=len(stacks)) * payouts[place]
+        left -= size
+
+    return (totals / samples).tolist()
+
+
+def _sample_python(stacks, payouts, places, samples, seed):
+    rng = random.Random(seed)
+    totals = [0.0] * len(stacks)
+
+    for _ in range(samples):
+        order = sorted(range(len(stacks)), key=lambda index: rng.expovariate(1.0) / stacks[index])
+        for place in range(places):
+            totals[order[place]] += payouts[place]
+
+    return [total / samples for total in totals]
+
+
+# function, that returns prize equities of stacks: exact, if it's cheap enough, else sampled
+def icm(stacks, payouts, samples=100000, seed=None):
+    alive = sum(1 for stack in stacks if stack > 0)
+    places = sum(1 for index, prize in enumerate(payouts) if prize and index < alive)
+
+    if _exact_cost(alive, places) <= EXACT_BUDGET:
+        return icm_exact(stacks, payouts)
+    return icm_sampled(stacks, payouts, samples, seed)
+
+
+# function, that returns list of pairs (player, prize equity) for players (by their stacks)
+def player_equities(players, payouts, **kwargs):
+    players = list(players)
+    return list(zip(players, icm([player.stack for player in players], payouts, **kwargs)))
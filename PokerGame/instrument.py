@@ -0,0 +1,218 @@
+"""
+    Module, that defines optional instrumentation of the game.
+
+    enable() wraps phases of Table (pre_flop, flop, turn, river, ask_players,
+    show_winner, reset_table) and Player.find_combination with timers, which
+    record latencies (monotonic clock, nanoseconds) into log2 histograms, and
+    counts hands, evaluations, actions and pots. disable() puts original
+    methods back, so disabled instrumentation costs nothing.
+
+    Snapshot of metrics: snapshot() (dict), to_json() or to_prometheus().
+"""
+
+import re
+import json
+import time
+import functools
+
+from table import Table
+from player import Player
+from ledger import Ledger
+from history import ACTIONS
+
+PHASES = ("pre_flop", "flop", "turn", "river", "ask_players", "show_winner", "reset_table")
+BUCKETS = 64
+
+
+class Histogram:
+    """
+       Class, that counts latencies by buckets of powers of two:
+       bucket i -- latencies less than 2 ** i nanoseconds
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def __repr__(self):
+        return f"Histogram(count={self.count}, total={self.total})"
+
+    def reset(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0      # nanoseconds
+
+    def observe(self, nanoseconds):
+        self.buckets[nanoseconds.bit_length()] += 1
+        self.count += 1
+        self.total += nanoseconds
+
+    # function, that returns latency (nanoseconds), which isn't exceeded by part q of observations
+    # (upper bound of bucket)
+    def quantile(self, q):
+        if not self.count:
+            return 0
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return 1 << index
+        return 1 << (BUCKETS - 1)
+
+    def as_dict(self):
+        last = max((index for index, count in enumerate(self.buckets) if count), default=-1)
+        return {
+            "count" : self.count,
+            "total_ns" : self.total,
+            "p50_ns" : self.quantile(0.5),
+            "p99_ns" : self.quantile(0.99),
+            "buckets" : self.buckets[:last + 1],
+        }
+
+
+class Metrics:
+    """
+       Class, that contains histograms (by names of phases) and counters
+    """
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    # histograms are reset in place (wrappers keep references to them)
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counters.clear()
+
+    def histogram(self, name):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        return self.histograms[name]
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+METRICS = Metrics()
+
+# list of (class, name, original function) of wrapped methods
+_patched = []
+
+
+# function, that returns wrapper of function, which records latency to histogram.
+# counter -- name of counter, which is increased by every call without exception
+# (pre_flop raises OnePlayerException, when hand isn't played)
+def _timed(function, histogram, counter=None):
+    clock = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            histogram.observe(clock() - start)
+        if counter is not None:
+            METRICS.count(counter)
+        return result
+
+    return wrapper
+
+
+def _count_action(function):
+    @functools.wraps(function)
+    def wrapper(self, player, action, value=0):
+        METRICS.count("actions." + ACTIONS.get(action, str(action)).replace(" ", "_"))
+        return function(self, player, action, value)
+
+    return wrapper
+
+
+def _count_pots(function):
+    @functools.wraps(function)
+    def wrapper(self):
+        pots = function(self)
+        METRICS.count("pots", len(pots))
+        return pots
+
+    return wrapper
+
+
+def _patch(cls, name, wrapper):
+    original = cls.__dict__[name]
+    _patched.append((cls, name, original))
+    setattr(cls, name, wrapper(original))
+
+
+# all classes of tables (Table and subclasses, which are imported already)
+def _table_classes():
+    classes = [Table]
+    for cls in classes:
+        classes.extend(cls.__subclasses__())
+    return classes
+
+
+def enabled():
+    return bool(_patched)
+
+
+# function, that starts instrumentation. Subclasses of Table, which override phases,
+# must be imported before calling
+def enable():
+    if enabled():
+        return
+
+    for cls in _table_classes():
+        for phase in PHASES:
+            if phase in cls.__dict__:
+                counter = "hands" if phase == "pre_flop" else None
+                _patch(cls, phase, lambda function: _timed(function, METRICS.histogram(phase), counter))
+        if "record_action" in cls.__dict__:
+            _patch(cls, "record_action", _count_action)
+
+    _patch(Player, "find_combination",
+           lambda function: _timed(function, METRICS.histogram("find_combination"), "evaluations"))
+    _patch(Ledger, "side_pots", _count_pots)
+
+
+def disable():
+    while _patched:
+        cls, name, original = _patched.pop()
+        setattr(cls, name, original)
+
+
+def snapshot():
+    return {
+        "histograms" : {name : histogram.as_dict() for name, histogram in METRICS.histograms.items()},
+        "counters" : dict(METRICS.counters),
+    }
+
+
+def to_json(indent=None):
+    return json.dumps(snapshot(), indent=indent)
+
+
+# function, that returns metrics in Prometheus text format
+def to_prometheus(prefix="poker"):
+    lines = []
+
+    lines.append(f"# TYPE {prefix}_phase_seconds histogram")
+    for name, histogram in METRICS.histograms.items():
+        cumulative = 0
+        for index, count in enumerate(histogram.buckets):
+            cumulative += count
+            if count:
+                lines.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="{(1 << index) / 1e9:g}"}} {cumulative}')
+        lines.append(f'{prefix}_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {histogram.count}')
+        lines.append(f'{prefix}_phase_seconds_sum{{phase="{name}"}} {histogram.total / 1e9:g}')
+        lines.append(f'{prefix}_phase_seconds_count{{phase="{name}"}} {histogram.count}')
+
+    for name, value in METRICS.counters.items():
+        # names of metrics may have only [a-zA-Z0-9_]: "actions.all-in" -> "actions_all_in"
+        metric = f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,87 @@
+"""
+    Module, that defines seat-indexed bank of the table
+"""
+
+class Ledger:
+    """
+       Class, that contains bank of the table by seats (index of player on the table).
+       Every action is O(1). Has attributes:
+       - bets -- [] : contributions of players in this hand
+       - all_in -- [] : True if player goes all-in
+       - folded -- [] : True if player passed
+       - max_bet -- the biggest contribution (maintained incrementally)
+       - total -- sum of bank
+    """
+
+    def __init__(self, seats):
+        self.reset(seats)
+
+    def __repr__(self):
+        return f"Ledger({self.bets})"
+
+    def reset(self, seats):
+        self.bets = [0] * seats
+        self.all_in = [False] * seats
+        self.folded = [False] * seats
+        self.max_bet = 0
+        self.total = 0
+
+    # player adds value to bank
+    def add(self, seat, value, all_in=False):
+        self.bets[seat] += value
+        self.total += value
+
+        if self.bets[seat] > self.max_bet:
+            self.max_bet = self.bets[seat]
+        if all_in:
+            self.all_in[seat] = True
+
+    # value is taken from bets of player (for paying winners)
+    def take(self, seat, value):
+        self.bets[seat] -= value
+        self.total -= value
+
+    def fold(self, seat):
+        self.folded[seat] = True
+
+    # value, which player must add to call
+    def to_call(self, seat):
+        return self.max_bet - self.bets[seat]
+
+    # True if player can answer (not passed and not all-in)
+    def active(self, seat):
+        return not self.folded[seat] and not self.all_in[seat]
+
+    # function, that splits bank to main pot and side pots.
+    # Contributions are sorted once, then every level of bets of not passed players
+    # closes one pot. Chips of passed players above the last level go to the last pot.
+    # Returns list of pairs (amount, [seats of players, who can win it]), main pot -- first
+    def side_pots(self):
+        bets = self.bets
+        order = sorted(range(len(bets)), key=lambda seat: bets[seat])
+        levels = sorted({bets[seat] for seat in order if not self.folded[seat] and bets[seat] > 0})
+
+        pots = []
+        previous = 0
+        index = 0
+        for level in levels:
+            start = index
+            amount = 0
+            # bets up to this level are fully in this pot
+            while index < len(bets) and bets[order[index]] <= level:
+                amount += bets[order[index]] - previous
+                index += 1
+            # others add only difference between levels
+            amount += (len(bets) - index) * (level - previous)
+
+            pots.append((amount, [seat for seat in order[start:] if not self.folded[seat]]))
+            previous = level
+
+        rest = sum(bets[seat] - previous for seat in order[index:])
+        if pots:
+            amount, seats = pots[-1]
+            pots[-1] = (amount + rest, seats)
+        elif rest:
+            pots.append((rest, [seat for seat in order if not self.folded[seat]]))
+
+        return pots
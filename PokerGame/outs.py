@@ -0,0 +1,160 @@
+"""
+    Module, that finds outs of players after the flop and the turn.
+
+    Remaining cards are grouped by rank: rank part of strength is looked up
+    once for every rank (or pair of ranks), flush is checked only for cards
+    of suits, where player has enough cards to complete it. So every card
+    (or pair of cards by the river) costs a few table lookups.
+    Cards are ints (see card module).
+"""
+
+from card import SUIT_MASK, SUIT_BITS, DECK_SIZE
+from evaluator import HandState, RANK_KEYS, RANK_BITS, RANK_TABLE, FLUSH_TABLE, combination_id
+
+BOARD_SIZE = 5
+
+
+class Outs:
+    """
+        Outs of one player:
+        - strength -- strength of current hand
+        - improving -- [] : cards, which improve combination of player
+        - leading -- [] : cards, after which player has the best hand alone
+        - next_improve, next_lead -- probabilities of that for the next card
+        - river_improve, river_lead -- the same by the river (all run-outs)
+    """
+
+    def __init__(self, strength, improving, leading, next_improve, next_lead, river_improve, river_lead):
+        self.strength = strength
+        self.improving = improving
+        self.leading = leading
+        self.next_improve = next_improve
+        self.next_lead = next_lead
+        self.river_improve = river_improve
+        self.river_lead = river_lead
+
+    def __repr__(self):
+        return f"Outs(improving={len(self.improving)}, leading={len(self.leading)}, " \
+               f"river_improve={self.river_improve:.4f}, river_lead={self.river_lead:.4f})"
+
+    def __str__(self):
+        return f"{len(self.improving)} outs ({self.next_improve * 100:.1f}% next card, " \
+               f"{self.river_improve * 100:.1f}% by river)"
+
+
+# function, that returns strengths of hand with every card of deck
+# and flush strengths, which every card can make (0 if it can't)
+def _next_strengths(state, deck):
+    key, masks = state.key, state.masks
+    made_flush = max(FLUSH_TABLE[mask] for mask in masks)
+    drawing = [bin(mask).count("1") >= 4 for mask in masks]     # suits, where one card makes flush
+
+    by_rank = {}
+    strengths = []
+    flushes = []
+    for card in deck:
+        rank = card >> SUIT_BITS
+        if rank not in by_rank:
+            by_rank[rank] = max(RANK_TABLE[key + RANK_KEYS[card]], made_flush)
+
+        suit = card & SUIT_MASK
+        flush = FLUSH_TABLE[masks[suit] | RANK_BITS[card]] if drawing[suit] else 0
+        strengths.append(max(by_rank[rank], flush))
+        flushes.append(flush)
+
+    return strengths, flushes
+
+
+# function, that returns strengths of hand with every pair of cards of deck
+# (in order of pairs (i, j), i < j)
+def _river_strengths(state, deck, flushes):
+    key, masks = state.key, state.masks
+    made_flush = max(FLUSH_TABLE[mask] for mask in masks)
+    drawing = [bin(mask).count("1") >= 3 for mask in masks]     # suits, where two cards make flush
+
+    by_ranks = {}
+    strengths = []
+    for i, first in enumerate(deck):
+        first_key = key + RANK_KEYS[first]
+        first_rank, first_suit = first >> SUIT_BITS, first & SUIT_MASK
+
+        for j in range(i + 1, len(deck)):
+            second = deck[j]
+            ranks = (first_rank, second >> SUIT_BITS)
+            if ranks not in by_ranks:
+                by_ranks[ranks] = max(RANK_TABLE[first_key + RANK_KEYS[second]], made_flush)
+
+            strength = by_ranks[ranks]
+            if flushes[i] > strength:
+                strength = flushes[i]
+            if flushes[j] > strength:
+                strength = flushes[j]
+            if first_suit == second & SUIT_MASK and drawing[first_suit]:
+                flush = FLUSH_TABLE[masks[first_suit] | RANK_BITS[first] | RANK_BITS[second]]
+                if flush > strength:
+                    strength = flush
+            strengths.append(strength)
+
+    return strengths
+
+
+# function, that returns list of indexes of players, who have the best hand alone
+# in every run-out (None -- tie). strengths -- [] of strengths of every player
+def _leaders(strengths):
+    leaders = []
+    for values in zip(*strengths):
+        best = max(values)
+        leaders.append(values.index(best) if values.count(best) == 1 else None)
+    return leaders
+
+
+# function, that finds outs of players by their hand states.
+# deck -- cards, which can come
+def outs_of_states(states, deck):
+    to_come = BOARD_SIZE - (states[0].count - 2)
+    if not 1 <= to_come <= 2:
+        raise ValueError("Outs are found only after the flop and the turn")
+
+    nexts = [_next_strengths(state, deck) for state in states]
+    next_leaders = _leaders([strengths for strengths, _ in nexts])
+
+    if to_come == 2:
+        rivers = [_river_strengths(state, deck, flushes) for state, (_, flushes) in zip(states, nexts)]
+        river_leaders = _leaders(rivers)
+    else:
+        rivers, river_leaders = [strengths for strengths, _ in nexts], next_leaders
+
+    results = []
+    for index, state in enumerate(states):
+        strength = state.strength()
+        combination = combination_id(strength)
+
+        strengths = nexts[index][0]
+        improving = [card for card, value in zip(deck, strengths) if combination_id(value) > combination]
+        leading = [card for card, leader in zip(deck, next_leaders) if leader == index]
+
+        river = rivers[index]
+        river_improve = sum(1 for value in river if combination_id(value) > combination) / len(river)
+        river_lead = river_leaders.count(index) / len(river_leaders)
+
+        results.append(Outs(strength, improving, leading,
+                            len(improving) / len(deck), len(leading) / len(deck),
+                            river_improve, river_lead))
+    return results
+
+
+# function, that finds outs of hands (pairs of cards) on board (3 or 4 cards).
+# dead -- other known cards, which can't come
+def outs(hands, board, dead=()):
+    known = set(board) | set(dead) | {card for hand in hands for card in hand}
+    deck = [card for card in range(DECK_SIZE) if card not in known]
+    return outs_of_states([HandState(list(hand) + list(board)) for hand in hands], deck)
+
+
+# function, that returns list of pairs (player, Outs) for players, who didn't pass.
+# Hand states of players are taken as they are (see Table.add_table_card)
+def table_outs(table):
+    players = [player for player in table.players if player.answer.passed != True]
+    known = set(table.table_cards) | {card for player in table.players for card in player.cards}
+    deck = [card for card in range(DECK_SIZE) if card not in known]
+    return list(zip(players, outs_of_states([player.hand_state for player in players], deck)))
@@ -2,109 +2,11 @@
     Module, that defines player objects
 """
 
-from collections import Counter
 import table as tb
-from card import Card, SUITS
-
-# function, which checks flush
-def _check_flush(cards):
-    spades = clubs = diamonds = hearts = 0
-
-    for card in cards:
-        if card.suit == SUITS[0]:
-            spades += 1
-        elif card.suit == SUITS[1]:
-            hearts += 1
-        elif card.suit == SUITS[2]:
-            clubs += 1
-        else:
-            diamonds += 1
-
-    if spades >= 5:
-        return [x for x in cards if x.suit == SUITS[0]]
-    elif hearts >= 5:
-        return [x for x in cards if x.suit == SUITS[1]]
-    elif clubs >= 5:
-        return [x for x in cards if x.suit == SUITS[2]]
-    elif diamonds >= 5:
-        return [x for x in cards if x.suit == SUITS[3]]
-    else:
-        return False
-
-
-# function, that checks straight
-def _check_straight(cards):
-    # add ace == 1, if ace in cards
-    # returns High cards of straight or False
-    
-    cards_copy = cards.copy()
-
-    for card in cards:
-        if card.value == 14:
-            cards_copy.insert(0, Card(card.suit, 1))
-
-    straight = []
-
-    for index in range(len(cards_copy) - 4):  # 4 -- 5 cards for one iteration
-        current_value = cards_copy[index].value
-        if cards_copy[index + 1].value == current_value + 1 and \
-            cards_copy[index + 2].value == current_value + 2 and \
-            cards_copy[index + 3].value == current_value + 3 and \
-            cards_copy[index + 4].value == current_value + 4:
-                straight.append(cards_copy[index + 4])         # biggest card
-
-    if not straight:
-        return False
-    else:
-        return straight
-    
-
-# function, that return dict with repetitions
-def _check_repetitions(cards):
-    #replace Ace == 1 with Ace == 14 for sorting....
-    for card in cards:
-        if card.value == 1:
-            card.value == 14
-
-    counter = Counter([card.value for card in cards])
-
-    # key - count repetitions card
-    # value -- cards
-    result = {
-        4 : [],
-        3 : [],
-        2 : [],
-        1 : [],
-        }
+from card import RANK_VIEWS, CARD_VIEWS, SUIT_BITS
+from evaluator import evaluate, unpack, combination_id, HandState
+from history import FOLD, CHECK, CALL, RAISE, ALL_IN, SMALL_BLIND, BIG_BLIND
 
-    for card, count in counter.items():
-        result[count].append(card)
-
-    # do transformations...
-    # we don't need 2 "Three of a Kind" or 3 "Two pairs"....
-    if result.get(4):           # 4 - 1, 3 - 0, 2 - 0
-        result[1] += result[2] + result[3]
-        result[2].clear()
-        result[3].clear()
-    elif result.get(3):         # 4 - 0, 3 - 1, 2 - 1(0)
-        if len(result[3]) > 1:
-            result[3].sort(reverse=True)
-            result[1].append(result[3].pop())
-        if len(result[2]) > 1:
-            result[2].sort(reverse=True)
-            result[1].append(result[2].pop())
-    elif result.get(2):         # 4 - 0, 3 - 0, 2 - 2, 1, 0
-        if len(result[2]) > 2:
-            result[2].sort(reverse=True)
-            result[1].append(result[2].pop())
-
-    # sorting... bigger -- first
-    for value in result.values():
-        value.sort(reverse=True)
-
-    return result
-
-       
 class IncorrectInputException(Exception):
     def __init__(self, *args, **kwargs):
         return super().__init__(*args, **kwargs)
@@ -124,11 +26,19 @@ class Combination:
         10 : "Royal flush",
         }
 
-    def __init__(self, comb, card, kicker=None, chain=None):
+    # combinations, which are shown with suits of cards
+    SUITED = (5, 6, 9, 10)
+
+    def __init__(self, comb, card, kicker=None, chain=None, *, key):
         self.__combination = comb       # int
         self.__card = card              # Card (or list of Cards)
         self.__kicker = kicker
         self.__chain = chain
+        self.__key = key                # int, strength from evaluator (totally ordered)
+
+    @property
+    def key(self):
+        return self.__key
 
     # string representation
     def __str__(self):
@@ -149,79 +59,84 @@ class Combination:
 
         return f"{self.COMBINATIONS[self.__combination]} with {cards}{kick}{chain}"
 
-    # compare methods
+    # compare methods (one int compare)
     def __eq__(self, value):
-        return self.__combination == value.__combination and \
-                self.__card == value.__card and \
-                self.__kicker == value.__kicker and \
-                self.__chain == value.__chain
+        if not isinstance(value, Combination):
+            return NotImplemented
+        return self.__key == value.__key
 
-    def __gt__(self, value):
-        if self.__combination > value.__combination:
-            return True
-        elif self.__combination == value.__combination:
-            if self.__card > value.__card:
-                return True
-            elif self.__card < value.__card:
-                return False
-
-            if self.__kicker and value.__kicker:
-                if self.__kicker > value.__kicker:
-                    return True
-                else:
-                    return False
-
-            if self.__chain and value.__chain:
-                if self.__chain > value.__chain:
-                    return True
-                else:
-                    return False
-
-            return False
-        else:
-            return False
+    def __hash__(self):
+        return hash(self.__key)
 
+    def __gt__(self, value):
+        return self.__key > value.__key
 
     def __ge__(self, value):
-        if self.__combination > value.__combination:
-            return True
-        elif self.__combination == value.__combination:
-            if self.__card > value.__card:
-                return True
-            elif self.__card < value.__card:
-                return False
-
-            if self.__kicker and value.__kicker:
-                if self.__kicker >= value.__kicker:
-                    return True
-                else:
-                    return False
-
-            if self.__chain and value.__chain:
-                if self.__chain >= value.__chain:
-                    return True
-                else:
-                    return False
-
-            return True
+        return self.__key >= value.__key
+
+    def __lt__(self, value):
+        return self.__key < value.__key
+
+    def __le__(self, value):
+        return self.__key <= value.__key
+
+
+    # function, that makes combination from strength (see evaluator module).
+    # masks -- rank masks of every suit of cards (see HandState), they give suits
+    # to cards of straights and flushes
+    @staticmethod
+    def from_strength(strength, masks=None):
+        comb, values = unpack(strength)
+        if comb in Combination.SUITED and masks is not None:
+            cards = Combination._suited_views(values, masks)
         else:
-            return False
+            cards = [RANK_VIEWS[value] for value in values]
+
+        if comb in (10, 9, 5):                 # straights -- only high card
+            return Combination(comb, cards[0], key=strength)
+        elif comb == 8:                        # "4 of a Kind"
+            return Combination(comb, cards[0], kicker=cards[1] if len(cards) > 1 else None, key=strength)
+        elif comb == 7:                        # "Full House"
+            return Combination(comb, cards[:2], key=strength)
+        elif comb == 6:                        # "Flush"
+            return Combination(comb, cards[0], chain=cards, key=strength)
+        elif comb == 4:                        # "3 of a Kind"
+            return Combination(comb, cards[0], chain=cards[1:], key=strength)
+        elif comb == 3:                        # "Two Pairs"
+            return Combination(comb, cards[:2], kicker=cards[2] if len(cards) > 2 else None, key=strength)
+        else:                                  # "Pair" or "High Card"
+            return Combination(comb, cards[0], chain=cards[1:], key=strength)
+
+
+    # function, that returns cards (views) of values with suits from masks:
+    # suit of flush, if there is one, else any suit of card with this value
+    @staticmethod
+    def _suited_views(values, masks):
+        flush = [suit for suit, mask in enumerate(masks) if bin(mask).count("1") >= 5]
+        cards = []
+        for value in values:
+            bit = 1 << (value - 2)
+            suit = flush[0] if flush else next(suit for suit, mask in enumerate(masks) if mask & bit)
+            cards.append(CARD_VIEWS[(value - 2) << SUIT_BITS | suit])
+        return cards
+
+
+    # function, which ranks players by combination in one pass. Returns list of
+    # groups (lists) of players with equal combinations, the strongest group -- first
+    @staticmethod
+    def rank_players(players):
+        groups = {}
 
+        for player in players:
+            groups.setdefault(player.combination.key, []).append(player)
 
+        return [groups[key] for key in sorted(groups, reverse=True)]
 
     # function, which find player with max combination. Returns list of
     # players with maximal combination
     @staticmethod
     def find_max(players):
-        max_combo_player = max(players, key=lambda x: x.combination)
-
-        result = [max_combo_player]
-
-        for player in players:
-            if player.combination == max_combo_player.combination and player != max_combo_player:
-                result.append(player)
-
-        return result
+        return Combination.rank_players(players)[0]
 
 
 
@@ -353,7 +268,9 @@ class Player:
         self.__cards = []
         self.answer = self._Answer()
         self.combination = None
+        self.hand_state = HandState()   # known cards of player (hole cards + table cards)
         self.__bet = 0
+        self.seat = 0       # index of player on the table (set by table)
 
     # string represents
     def __repr__(self):
@@ -388,6 +305,7 @@ class Player:
     def cards(self, value):
         if len(value) == 2:
             self.__cards = value
+            self.hand_state = HandState(value)
         else:
             raise ValueError("Too much cards for one player")
 
@@ -415,62 +333,64 @@ class Player:
         #table.answers[self] = self.answer
         
         # check call (and do call)
-        stack_list = [bank[0] for bank in table.bank.values()]
+        difference = table.ledger.to_call(self.seat)
 
-        if max(stack_list) != table.bank[table.players.index(self)][0]:
-            difference = max(stack_list) - table.bank[table.players.index(self)][0]
-            
-            if difference > self.stack:
-                table.bank[table.players.index(self)][0] += self.stack            
+        if difference > 0:
+            if difference >= self.stack:
+                table.ledger.add(self.seat, self.stack, all_in=True)
+                table.record_action(self, CALL, self.stack)
                 self.answer.called = True
                 self.answer.asked = True
                 self.bet += self.stack
                 self.stack = 0
-                table.bank[table.players.index(self)][1] = True
             else:
-                table.bank[table.players.index(self)][0] += difference
+                table.ledger.add(self.seat, difference)
+                table.record_action(self, CALL, difference)
                 self.answer.called = True
                 self.answer.asked = True
                 self.bet += difference
                 self.stack -= difference
+        else:
+            table.record_action(self, CHECK)
 
 
 
     def do_pass(self, table):
         self.answer.passed = True
         self.answer.asked = True
-        #table.bank[table.players.index(self)][0] = self.answer
+        table.ledger.fold(self.seat)
+        table.record_action(self, FOLD)
 
 
     def do_raise(self, table, value=0, all_in=False, sb=False, bb=False):
         if all_in:
-            table.bank[table.players.index(self)][0] += self.stack            
+            table.ledger.add(self.seat, self.stack, all_in=True)
+            table.record_action(self, ALL_IN, self.stack)
             self.answer.raised = True
             self.answer.asked = True
             self.bet += self.stack
             self.stack = 0
-            table.bank[table.players.index(self)][1] = True
         elif 0 < value <= self.stack:
-            table.bank[table.players.index(self)][0] += value
-
             if sb:
                 self.answer.smallblind = True
+                table.record_action(self, SMALL_BLIND, value)
             elif bb:
                 self.answer.bigblind = True
+                table.record_action(self, BIG_BLIND, value)
             else:
                 self.answer.raised = True
+                table.record_action(self, ALL_IN if value == self.stack else RAISE, value)
             self.answer.asked = True
             self.bet += value
             self.stack -= value
             
-            # player go all-in
-            if self.stack == 0:
-                table.bank[table.players.index(self)][1] = True
+            # player go all-in, if stack == 0
+            table.ledger.add(self.seat, value, all_in=self.stack == 0)
         else:
             raise IncorrectInputException("This value are incorrect for betting....")
 
     def ask(self, table):
-        print("Your move!\nYou can press 'p' for pass, 'c' for check (call), 'b' for bet or 'a' for all-in: ")
+        table.renderer.below("Your move!\nYou can press 'p' for pass, 'c' for check (call), 'b' for bet or 'a' for all-in: ")
         
         answer = tb.get_char()
 
@@ -482,6 +402,7 @@ class Player:
             self.do_raise(table, all_in=True)
         elif answer == b'b':
             bet_value = input("Enter value for bet: ")
+            table.renderer.scrolled()       # echo of input
             try:
                 self.do_raise(table, int(bet_value))
             except ValueError:
@@ -490,77 +411,21 @@ class Player:
             raise IncorrectInputException("Incorrect input value...")
 
 
-    # function, thats find the best combination and write this to Player.combination attribute
-    # cards -- 7 cards, sum table cards (5) + player cards (2)
-    
-
-    def find_combination(self, cards):
-        # sorting cards.... 
-        cards.sort(key=lambda x: x.value)
+    # function, that adds table card to known cards of player (O(1))
+    def see_card(self, card):
+        self.hand_state.add(card)
 
-        flush = _check_flush(cards)
 
-        if flush:
-            straight = _check_straight(flush) # may be straight flush
+    # function, thats find the best combination and write this to Player.combination attribute
+    # cards -- 5-7 cards (ints), sum table cards (5) + player cards (2);
+    # None -- known cards (hole cards and table cards, which are dealt already)
+    def find_combination(self, cards=None):
+        if cards is None:
+            strength, masks = self.hand_state.strength(), self.hand_state.masks
         else:
-            straight = _check_straight(cards) # if straight flush isn't be
-
-        if flush and straight:    
-            # straight flush or royal flush
-            # max card in straight...
-            max_card = straight[0]
-
-            for card in straight:
-                if card > max_card:
-                    max_card = card
-                    
-            if max_card.value == 14:        # royal flush                    
-                self.combination = Combination(10, max_card)
-                return
-            else:                           # straight flush
-                self.combination = Combination(9, max_card)
-                return
-        
-        # if we have any of this combinations, "4 of a Kind" or "Full House" are impossible.
-        # so this combinations in this case are maximal    
-        elif flush:
-            self.combination = Combination(6, flush[-1], chain=list(reversed(flush)))
-            return
-        elif straight:
-            max_card = straight[0]
-
-            for card in straight:
-                if card > max_card:
-                    max_card = card
-
-            self.combination = Combination(5, max_card)
-            return
-
-        repetitions = _check_repetitions(cards)
-
-        if repetitions.get(4):               # "4 of a Kind" found (may be only one)
-            self.combination = Combination(8, Card('default', repetitions.get(4)[0]), kicker=Card('default', repetitions.get(1)[0]))
-            return
-        elif repetitions.get(3):             # "3 of a Kind" or "Full House"
-            if repetitions.get(2):              # "Full House"
-                self.combination = Combination(7, [Card('default', repetitions.get(3)[0]), Card('default', repetitions.get(2)[0])] )
-                return
-            else:                               # "3 of a Kind"
-                self.combination = Combination(4, Card('default', repetitions.get(3)[0]), chain=[Card('default', repetitions.get(1)[0]),
-                                                                                               Card('default', repetitions.get(1)[1])])
-                return
-        elif repetitions.get(2):             # "Pair" or "Two Pairs"
-            if len(repetitions[2]) == 2:        # "Two Pairs"
-                self.combination = Combination(3, [Card('default', repetitions.get(2)[0]), Card('default', repetitions.get(2)[1])], 
-                                               kicker=Card('default', repetitions.get(1)[0]))
-                return
-            else:                               # "Pair"
-                self.combination = Combination(2, Card('default', repetitions.get(2)[0]), 
-                                               chain=[Card('default', repetitions.get(1)[index]) for index in range(3)] )
-                return
-        else:                                # "High Card"
-            self.combination = Combination(1, Card('default', repetitions.get(1)[0]), 
-                                               chain=[Card('default', repetitions.get(1)[index]) for index in range(1, 5)] )
-            return
-
+            strength = evaluate(cards)
+            # suits are needed only for straights and flushes
+            masks = HandState(cards).masks if combination_id(strength) in Combination.SUITED else None
 
+        self.combination = Combination.from_strength(strength, masks)
+        return self.combination
@@ -0,0 +1,214 @@
+"""
+    Module, that defines precomputed preflop tables:
+    - strength -- equity of every of 169 starting hands against one random hand
+    - heads-up -- equity of every starting hand against every other (169 x 169)
+
+    Tables are generated once (python preflop.py [samples] [path]) and stored in
+    binary file, which is loaded lazily via memory mapping. Starting hands are
+    classes of hole cards (pairs, suited and offsuit), so card removal between
+    two concrete hands is averaged out.
+
+    File format (little-endian):
+        header -- magic b"PKPF", version (uint16), classes (uint16), samples (uint32)
+        169 float32 -- strengths
+        169 * 169 float32 -- heads-up equities, row -- hand, column -- opponent
+"""
+
+import os
+import sys
+import mmap
+import struct
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+from card import SUIT_BITS, SUIT_MASK, DECK_SIZE
+from evaluator import np
+
+if np is not None:
+    from evaluator import evaluate_batch, shared_tables, attach_tables
+
+MAGIC = b"PKPF"
+VERSION = 1
+CLASSES = 169
+HEADER = struct.Struct("<4sHHI")
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop.bin")
+
+RANKS_COUNT = 13
+RANK_NAMES = "23456789TJQKA"
+
+
+# function, that returns index of starting hand (0..168) for two hole cards (ints).
+# Index is a cell of 13 x 13 grid: pairs -- on diagonal,
+# suited -- row > column, offsuit -- row < column
+def hand_class(card1, card2):
+    rank1, rank2 = card1 >> SUIT_BITS, card2 >> SUIT_BITS
+    high, low = max(rank1, rank2), min(rank1, rank2)
+
+    if (card1 & SUIT_MASK) == (card2 & SUIT_MASK):
+        return high * RANKS_COUNT + low
+    return low * RANKS_COUNT + high
+
+
+# function, that returns name of starting hand ("AA", "AKs", "72o")
+def class_name(index):
+    row, column = divmod(index, RANKS_COUNT)
+    high, low = max(row, column), min(row, column)
+    name = RANK_NAMES[high] + RANK_NAMES[low]
+
+    if row == column:
+        return name
+    return name + ("s" if row > column else "o")
+
+
+_combos = None
+
+
+# function, that returns all hole cards (pairs of ints) of starting hand
+def class_combos(index):
+    global _combos
+
+    if _combos is None:
+        _combos = [[] for _ in range(CLASSES)]
+        for card1, card2 in combinations(range(DECK_SIZE), 2):
+            _combos[hand_class(card1, card2)].append((card1, card2))
+
+    return _combos[index]
+
+
+# Generation (needs numpy)
+
+# function, that returns (samples, count) random cards, which aren't in used (samples, k)
+def _random_cards(rng, used, count):
+    keys = rng.random((len(used), DECK_SIZE))
+    keys[np.arange(len(used))[:, None], used] = 2.0         # used cards are never chosen
+    return np.argpartition(keys, count, axis=1)[:, :count]
+
+
+# function, that returns rows of hands of class index without repeated cards in used
+def _random_hands(rng, combos, used):
+    hands = combos[rng.integers(0, len(combos), size=len(used))]
+    repeated = np.arange(len(used))
+    while repeated.size:
+        conflict = (hands[repeated][:, :, None] == used[repeated][:, None, :]).any(axis=(1, 2))
+        repeated = repeated[conflict]
+        hands[repeated] = combos[rng.integers(0, len(combos), size=repeated.size)]
+    return hands
+
+
+# worker function, that counts row of tables for one starting hand
+# returns (index, strength, [equities against every class])
+def _generate_row(index, samples, seed):
+    rng = np.random.default_rng(seed)
+    combos = [np.array(class_combos(other), dtype=np.intp) for other in range(CLASSES)]
+
+    def equity(hands, others, boards):
+        mine = evaluate_batch(np.concatenate((hands, boards), axis=1))
+        theirs = evaluate_batch(np.concatenate((others, boards), axis=1))
+        return float(((mine > theirs) + 0.5 * (mine == theirs)).mean())
+
+    # against random hand
+    hands = combos[index][rng.integers(0, len(combos[index]), size=samples)]
+    cards = _random_cards(rng, hands, 7)
+    strength = equity(hands, cards[:, :2], cards[:, 2:])
+
+    row = []
+    for other in range(CLASSES):
+        hands = combos[index][rng.integers(0, len(combos[index]), size=samples)]
+        others = _random_hands(rng, combos[other], hands)
+        boards = _random_cards(rng, np.concatenate((hands, others), axis=1), 5)
+        row.append(equity(hands, others, boards))
+
+    return index, strength, row
+
+
+# function, that generates tables and writes them to path.
+# samples -- run-outs for every pair of starting hands
+def generate(path=DEFAULT_PATH, samples=2000, processes=None, seed=None):
+    if np is None:
+        raise ImportError("numpy is required for generation of preflop tables")
+
+    seeds = np.random.SeedSequence(seed).spawn(CLASSES)
+    strengths = np.zeros(CLASSES, dtype="<f4")
+    heads_up = np.zeros((CLASSES, CLASSES), dtype=np.float64)
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=attach_tables, initargs=(shared_tables(),)) as pool:
+        futures = [pool.submit(_generate_row, index, samples, int(seeds[index].generate_state(1)[0]))
+                   for index in range(CLASSES)]
+        for future in futures:
+            index, strength, row = future.result()
+            strengths[index] = strength
+            heads_up[index] = row
+
+    # equity of hand against opponent + equity of opponent against hand == 1
+    heads_up = ((heads_up + 1 - heads_up.T) / 2).astype("<f4")
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, CLASSES, samples))
+        file.write(strengths.tobytes())
+        file.write(heads_up.tobytes())
+
+
+# Loading and lookups
+
+class PreflopTables:
+    """
+       Class, that gives read-only access to memory-mapped tables file
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, classes, self.samples = HEADER.unpack_from(self.__map)
+        if magic != MAGIC or version != VERSION or classes != CLASSES:
+            raise ValueError(f"{path} isn't preflop tables file of version {VERSION}")
+
+        size = HEADER.size + 4 * (CLASSES + CLASSES * CLASSES)
+        if len(self.__map) != size:
+            raise ValueError(f"{path} has incorrect size")
+
+        # floats are stored little-endian
+        if sys.byteorder != "little":
+            raise ValueError("Preflop tables can be loaded only on little-endian machines")
+
+        view = memoryview(self.__map)[HEADER.size:].cast("f")
+        self.__strengths = view[:CLASSES]
+        self.__heads_up = view[CLASSES:]
+
+    def __repr__(self):
+        return f"PreflopTables(samples={self.samples})"
+
+    def strength(self, card1, card2):
+        return self.__strengths[hand_class(card1, card2)]
+
+    def heads_up(self, hand, other):
+        return self.__heads_up[hand_class(*hand) * CLASSES + hand_class(*other)]
+
+
+_tables = None
+
+
+def _get_tables():
+    global _tables
+
+    if _tables is None:
+        if not os.path.exists(DEFAULT_PATH):
+            raise FileNotFoundError("Preflop tables aren't generated, run: python preflop.py")
+        _tables = PreflopTables(DEFAULT_PATH)
+
+    return _tables
+
+
+# equity of two hole cards (ints) against one random hand
+def preflop_strength(card1, card2):
+    return _get_tables().strength(card1, card2)
+
+
+# equity of hole cards (pair of ints) against other hole cards
+def heads_up_equity(hand, other):
+    return _get_tables().heads_up(hand, other)
+
+
+if __name__ == "__main__":
+    generate(samples=int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+             path=sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PATH)
@@ -0,0 +1,356 @@
+"""
+    Module, that defines ranges of hands and range-vs-range equity.
+
+    Range is a set of two-card combos (1326 of them), kept as bitset (int):
+    bit i -- combo COMBOS[i]. Union, intersection and removal of combos
+    blocked by known cards are single int operations (BLOCKERS[card] --
+    bitset of combos with card).
+
+    Notation (comma-separated): "TT" (pair), "TT+" (TT and better pairs),
+    "TT-77", "AKs" (suited), "AKo" (offsuit), "AK" (both), "ATs+" (ATs..AKs),
+    "76s-54s" (connectors), "KTo-K7o", "AsKs" (one combo), "any".
+    Cards are ints (see card module).
+"""
+
+import random
+from itertools import combinations
+
+from card import DECK_SIZE, SUIT_BITS, RANK_LETTERS, parse_cards
+from evaluator import evaluate, np
+
+if np is not None:
+    from evaluator import evaluate_batch
+
+BOARD_SIZE = 5
+SUITS_COUNT = 4
+STRENGTH_BITS = 24          # strengths are less than 1 << 24 (see evaluator.pack)
+
+COMBOS = tuple(combinations(range(DECK_SIZE), 2))
+COMBOS_COUNT = len(COMBOS)                  # 1326
+ALL_COMBOS = (1 << COMBOS_COUNT) - 1
+
+# index of combo by its cards (both orders)
+COMBO_INDEX = {}
+for _index, (_first, _second) in enumerate(COMBOS):
+    COMBO_INDEX[_first, _second] = COMBO_INDEX[_second, _first] = _index
+
+# bitsets of combos with card
+BLOCKERS = [0] * DECK_SIZE
+for _index, (_first, _second) in enumerate(COMBOS):
+    BLOCKERS[_first] |= 1 << _index
+    BLOCKERS[_second] |= 1 << _index
+
+
+# function, that returns bitset of combos, which have any of cards
+def blocked(cards):
+    bits = 0
+    for card in cards:
+        bits |= BLOCKERS[card]
+    return bits
+
+
+# Bitsets of hand classes, ranks -- 0 (deuce) .. 12 (ace)
+
+def _combo_bit(rank1, suit1, rank2, suit2):
+    return 1 << COMBO_INDEX[rank1 << SUIT_BITS | suit1, rank2 << SUIT_BITS | suit2]
+
+def _pair(rank):
+    return sum(_combo_bit(rank, suit1, rank, suit2) for suit1, suit2 in combinations(range(SUITS_COUNT), 2))
+
+def _suited(high, low):
+    return sum(_combo_bit(high, suit, low, suit) for suit in range(SUITS_COUNT))
+
+def _offsuit(high, low):
+    return sum(_combo_bit(high, suit1, low, suit2)
+               for suit1 in range(SUITS_COUNT) for suit2 in range(SUITS_COUNT) if suit1 != suit2)
+
+def _hands(high, low, kind):
+    if high == low:
+        return _pair(high)
+    if kind == "s":
+        return _suited(high, low)
+    if kind == "o":
+        return _offsuit(high, low)
+    return _suited(high, low) | _offsuit(high, low)
+
+
+# function, that parses "AKs" to (high rank, low rank, kind ("s", "o" or ""))
+def _parse_hand(text, token):
+    if len(text) not in (2, 3) or text[0] not in RANK_LETTERS or text[1] not in RANK_LETTERS:
+        raise ValueError(f"Incorrect range: {token}")
+
+    first, second = RANK_LETTERS.index(text[0]), RANK_LETTERS.index(text[1])
+    kind = text[2:]
+    if kind not in ("", "s", "o") or (first == second and kind):
+        raise ValueError(f"Incorrect range: {token}")
+    return max(first, second), min(first, second), kind
+
+
+def _parse_token(token):
+    text = token.strip()
+    if not text:
+        return 0
+    if text.lower() in ("any", "random"):
+        return ALL_COMBOS
+
+    # one combo: "AsKs"
+    if len(text) == 4 and text[1] in "shcdSHCD" and text[3] in "shcdSHCD":
+        first, second = parse_cards(text)
+        if first == second:
+            raise ValueError(f"Incorrect range: {token}")
+        return 1 << COMBO_INDEX[first, second]
+
+    text = text[:1].upper() + text[1:2].upper() + text[2:]
+    bits = 0
+
+    if text.endswith("+"):
+        high, low, kind = _parse_hand(text[:-1], token)
+        if high == low:                         # "TT+"
+            for rank in range(low, len(RANK_LETTERS)):
+                bits |= _pair(rank)
+        else:                                   # "ATs+" -- kicker up to high card
+            for rank in range(low, high):
+                bits |= _hands(high, rank, kind)
+
+    elif "-" in text:
+        start, end = text.split("-", 1)
+        high1, low1, kind1 = _parse_hand(start, token)
+        high2, low2, kind2 = _parse_hand(end[:1].upper() + end[1:2].upper() + end[2:], token)
+        if kind1 != kind2:
+            raise ValueError(f"Incorrect range: {token}")
+
+        if high1 == low1 and high2 == low2:     # "TT-77"
+            for rank in range(min(high1, high2), max(high1, high2) + 1):
+                bits |= _pair(rank)
+        elif high1 == high2:                    # "KTs-K7s"
+            for rank in range(min(low1, low2), max(low1, low2) + 1):
+                bits |= _hands(high1, rank, kind1)
+        elif high1 - low1 == high2 - low2:      # "76s-54s"
+            for shift in range(abs(high1 - high2) + 1):
+                low = min(low1, low2) + shift
+                bits |= _hands(low + high1 - low1, low, kind1)
+        else:
+            raise ValueError(f"Incorrect range: {token}")
+
+    else:
+        bits = _hands(*_parse_hand(text, token))
+
+    return bits
+
+
+class Range:
+    """
+       Class, that contains set of combos (bitset, see COMBOS)
+    """
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    @staticmethod
+    def parse(text):
+        bits = 0
+        for token in text.split(","):
+            bits |= _parse_token(token)
+        return Range(bits)
+
+    @staticmethod
+    def of(combos):
+        bits = 0
+        for first, second in combos:
+            bits |= 1 << COMBO_INDEX[first, second]
+        return Range(bits)
+
+    def __repr__(self):
+        return f"Range(combos={len(self)})"
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __contains__(self, combo):
+        return bool(self.bits >> COMBO_INDEX[tuple(combo)] & 1)
+
+    def __iter__(self):
+        for index in self.indexes():
+            yield COMBOS[index]
+
+    def __eq__(self, other):
+        if not isinstance(other, Range):
+            return NotImplemented
+        return self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __or__(self, other):
+        return Range(self.bits | other.bits)
+
+    def __and__(self, other):
+        return Range(self.bits & other.bits)
+
+    def __sub__(self, other):
+        return Range(self.bits & ~other.bits)
+
+    # range without combos, which have any of cards
+    def without(self, cards):
+        return Range(self.bits & ~blocked(cards))
+
+    def indexes(self):
+        bits = self.bits
+        indexes = []
+        while bits:
+            low = bits & -bits
+            indexes.append(low.bit_length() - 1)
+            bits ^= low
+        return indexes
+
+    # numpy array of bools (mask of COMBOS)
+    def mask(self):
+        data = self.bits.to_bytes((COMBOS_COUNT + 7) // 8, "little")
+        return np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")[:COMBOS_COUNT].astype(bool)
+
+
+# Range-vs-range equity
+
+class RangeEquity:
+    """
+        Equity of the first range against the second one:
+        - win, tie -- probabilities to win and to split bank
+        - equity -- share of the bank on average
+        - matchups -- count of (combo, combo, run-out) without common cards
+    """
+
+    def __init__(self, win, tie, equity, matchups):
+        self.win = win
+        self.tie = tie
+        self.equity = equity
+        self.matchups = matchups
+
+    def __repr__(self):
+        return f"RangeEquity(win={self.win:.4f}, tie={self.tie:.4f}, equity={self.equity:.4f}, matchups={self.matchups})"
+
+    def __str__(self):
+        return f"{self.equity * 100:.1f}%"
+
+
+# generator of boards: all run-outs after the flop, samples random boards before it
+def _boards(board, deck, samples, rng):
+    missing = BOARD_SIZE - len(board)
+    if len(board) >= 3:
+        for run_out in combinations(deck, missing):
+            yield board + list(run_out)
+    else:
+        for _ in range(samples):
+            yield board + rng.sample(deck, missing)
+
+
+# function, that counts (wins, ties, matchups) on one full board (numpy).
+# combos -- array of COMBOS, hero, villain -- arrays of indexes of combos without board cards
+def _count_numpy(combos, board, hero, villain):
+    live = np.union1d(hero, villain)
+    hands = np.empty((live.size, 7), dtype=np.intp)
+    hands[:, :2] = combos[live]
+    hands[:, 2:] = board
+    strengths = np.zeros(COMBOS_COUNT, dtype=np.int64)
+    strengths[live] = evaluate_batch(hands)
+
+    hero_strengths = strengths[hero]
+    villain_strengths = strengths[villain]
+    in_villain = np.zeros(COMBOS_COUNT, dtype=np.int64)
+    in_villain[villain] = 1
+
+    # villain strengths sorted -- all and by every card (key: card << STRENGTH_BITS | strength)
+    ordered = np.sort(villain_strengths)
+    card_keys = np.sort(np.concatenate((combos[villain, 0] << STRENGTH_BITS | villain_strengths,
+                                        combos[villain, 1] << STRENGTH_BITS | villain_strengths)))
+
+    # count of villain combos weaker than hero combo ("left") or not stronger ("right").
+    # Combos with cards of hero combo are excluded (inclusion-exclusion by two cards:
+    # the same combo is excluded twice and has the same strength)
+    def weaker(side):
+        count = np.searchsorted(ordered, hero_strengths, side)
+        for column in (0, 1):
+            card = combos[hero, column] << STRENGTH_BITS
+            count -= np.searchsorted(card_keys, card | hero_strengths, side) - np.searchsorted(card_keys, card, "left")
+        if side == "right":
+            count += in_villain[hero]
+        return count
+
+    wins = weaker("left")
+    not_stronger = weaker("right")
+    matchups = villain.size - _card_counts(combos, villain, hero) + in_villain[hero]
+    return int(wins.sum()), int((not_stronger - wins).sum()), int(matchups.sum())
+
+
+# count of villain combos with the first or the second card of every hero combo
+def _card_counts(combos, villain, hero):
+    counts = np.bincount(combos[villain].ravel(), minlength=DECK_SIZE)
+    return counts[combos[hero, 0]] + counts[combos[hero, 1]]
+
+
+def _count_python(board, hero, villain):
+    strengths = {index : evaluate(list(COMBOS[index]) + board) for index in set(hero) | set(villain)}
+
+    wins = ties = matchups = 0
+    for first in hero:
+        cards = COMBOS[first]
+        for second in villain:
+            if cards[0] in COMBOS[second] or cards[1] in COMBOS[second]:
+                continue
+            matchups += 1
+            if strengths[first] > strengths[second]:
+                wins += 1
+            elif strengths[first] == strengths[second]:
+                ties += 1
+    return wins, ties, matchups
+
+
+# function, that counts equity of hero range against villain range.
+# board -- table cards (0-5), dead -- other known cards (for example, cards of players).
+# Before the flop samples random boards are used, after it -- all run-outs
+def range_equity(hero, villain, board=(), dead=(), samples=1000, seed=None):
+    board = list(board)
+    known = board + list(dead)
+    hero, villain = hero.without(known), villain.without(known)
+    deck = [card for card in range(DECK_SIZE) if card not in known]
+    rng = random.Random(seed)
+
+    if np is not None:
+        combos = np.array(COMBOS, dtype=np.int64)
+
+    wins = ties = matchups = 0
+    for full in _boards(board, deck, samples, rng):
+        run_out = full[len(board):]
+        hero_live, villain_live = hero.without(run_out), villain.without(run_out)
+        if not hero_live or not villain_live:
+            continue
+
+        if np is not None:
+            counts = _count_numpy(combos, np.array(full, dtype=np.intp),
+                                  np.array(hero_live.indexes(), dtype=np.intp),
+                                  np.array(villain_live.indexes(), dtype=np.intp))
+        else:
+            counts = _count_python(full, hero_live.indexes(), villain_live.indexes())
+
+        wins += counts[0]
+        ties += counts[1]
+        matchups += counts[2]
+
+    if not matchups:
+        raise ValueError("Ranges have no combos without common cards")
+    return RangeEquity(wins / matchups, ties / matchups, (wins + ties / 2) / matchups, matchups)
+
+
+# function, that returns equity of every player, who didn't pass, against range
+# of opponents (a range for every opponent isn't known, so it's one range)
+def table_range_equity(table, villain, **kwargs):
+    players = [player for player in table.players if player.answer.passed != True]
+    dead = [card for player in table.players for card in player.cards]
+
+    results = []
+    for player in players:
+        others = [card for card in dead if card not in player.cards]
+        results.append((player, range_equity(Range.of([player.cards]), villain, table.table_cards, others, **kwargs)))
+    return results
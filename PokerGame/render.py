@@ -0,0 +1,124 @@
+"""
+    Module, that defines buffered terminal renderer.
+
+    Frame is built in buffer line by line and written at once with ANSI
+    cursor control: only lines, which differ from the shown frame, are
+    redrawn (ESC[K clears rest of line), lines below the frame are erased
+    with ESC[J. Output, which is not a terminal, gets plain lines.
+
+    Prompts are written under the frame with Renderer.below. When the frame
+    and lines under it don't fit into the terminal, the terminal scrolls and
+    rows of the shown frame move, so the next frame is drawn on the cleared screen.
+"""
+
+import os
+import sys
+import shutil
+
+ESC = "\x1b["
+CLEAR_SCREEN = ESC + "H" + ESC + "2J"
+CLEAR_LINE = ESC + "K"
+CLEAR_BELOW = ESC + "J"
+
+
+# function, that returns sequence, which moves cursor to row (from 0) and first column
+def move_to(row):
+    return f"{ESC}{row + 1};1H"
+
+
+# function, that turns on ANSI sequences in Windows console (Windows 10+)
+def _enable_windows_ansi():
+    try:
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)         # STD_OUTPUT_HANDLE
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)    # ENABLE_VIRTUAL_TERMINAL_PROCESSING
+    except (AttributeError, OSError):
+        pass
+
+
+class Renderer:
+    """
+       Class, that draws frames (lists of lines) to stream
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream            # None -- current sys.stdout
+        self.__frame = []
+        self.__shown = None         # lines on the screen, None -- screen must be cleared
+        self.__below = 0            # count of lines written under the shown frame
+
+        if os.name == "nt":
+            _enable_windows_ansi()
+
+    def __repr__(self):
+        return f"Renderer(lines={len(self.__frame)})"
+
+    # add line to the frame
+    def line(self, text=""):
+        self.__frame.append(text)
+
+    # the next frame is drawn on the cleared screen
+    def invalidate(self):
+        self.__shown = None
+
+    # function, that invalidates the shown frame, if it was scrolled out of terminal
+    # (the frame and lines under it are taller than terminal)
+    def __check_scroll(self):
+        if self.__shown is not None and len(self.__shown) + self.__below >= shutil.get_terminal_size().lines:
+            self.invalidate()
+
+    # write text (prompt) under the shown frame, end -- as in print
+    def below(self, text="", end="\n"):
+        stream = self.__stream()
+        stream.write(text + end)
+        stream.flush()
+        self.scrolled((text + end).count("\n"))
+
+    # the next lines were written under the frame not by renderer (for example, echo of input)
+    def scrolled(self, lines=1):
+        self.__below += lines
+        self.__check_scroll()
+
+    # function, that returns output for the frame and remembers it as shown
+    def diff(self):
+        frame, self.__frame = self.__frame, []
+        output = []
+
+        shown = self.__shown
+        if shown is None:
+            output.append(CLEAR_SCREEN)
+            shown = []
+
+        for row, text in enumerate(frame):
+            if row >= len(shown) or shown[row] != text:
+                output.append(move_to(row) + text + CLEAR_LINE)
+
+        # cursor under the frame, everything printed after the previous frame is erased
+        output.append(move_to(len(frame)) + CLEAR_BELOW)
+
+        self.__shown = frame
+        self.__below = 0
+        self.__check_scroll()
+        return "".join(output)
+
+    def __stream(self):
+        return self.stream if self.stream is not None else sys.stdout
+
+    def render(self):
+        stream = self.__stream()
+
+        isatty = getattr(stream, "isatty", None)
+        if isatty is not None and isatty():
+            stream.write(self.diff())
+        else:
+            frame, self.__frame = self.__frame, []
+            stream.write("".join(text + "\n" for text in frame))
+        stream.flush()
+
+    def clear(self):
+        self.__frame = []
+        self.invalidate()
+        self.render()
@@ -0,0 +1,198 @@
+"""
+    Module, that defines replaying of binary hand history (see history module).
+    History file is memory-mapped, hands are found by offset index and
+    only records of needed hand are unpacked.
+"""
+
+import os
+import mmap
+from collections import Counter
+
+from history import RECORD, INDEX, INDEX_SUFFIX, HAND_START, SEAT, HOLE, ACTION, BOARD, PAYOUT, HAND_END, \
+                    FOLD, CHECK, CALL, RAISE, ALL_IN, SMALL_BLIND, BIG_BLIND
+from evaluator import evaluate, np
+from table import Table
+from player import Player
+
+KIND_OFFSET = 4         # offset of kind byte in record
+
+# structured type of record for zero-copy numpy view
+if np is not None:
+    RECORD_DTYPE = np.dtype([("hand", "<u4"), ("kind", "u1"), ("seat", "u1"), ("a", "u1"), ("b", "u1"), ("amount", "<i8")])
+
+
+class HandHistoryReader:
+    """
+       Class, that gives access to hands of history file.
+       Offsets of hands are taken from index file; hands, which aren't
+       in index (or all hands, if there is no index), are found by
+       scanning only kind bytes of records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            size -= size % RECORD.size                # incomplete record at the end is ignored
+            self.__map = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) if size else b""
+        self.__view = memoryview(self.__map)
+
+        # offsets of hands from index file
+        self.__index = memoryview(b"").cast("Q")
+        if os.path.exists(path + INDEX_SUFFIX):
+            with open(path + INDEX_SUFFIX, "rb") as file:
+                count = os.fstat(file.fileno()).st_size // INDEX.size
+                if count:
+                    self.__index_map = mmap.mmap(file.fileno(), count * INDEX.size, access=mmap.ACCESS_READ)
+                    self.__index = memoryview(self.__index_map).cast("Q")
+
+        # hands after the last indexed one (index is written after records, so it may be behind)
+        start = self.__index[-1] + RECORD.size if len(self.__index) else 0
+        start -= start % RECORD.size            # scan only aligned records, even if index is damaged
+        kinds = self.__view[start + KIND_OFFSET::RECORD.size].tobytes()
+        self.__extra = []
+        position = kinds.find(HAND_START)
+        while position != -1:
+            self.__extra.append(start + position * RECORD.size)
+            position = kinds.find(HAND_START, position + 1)
+
+    def __repr__(self):
+        return f"HandHistoryReader({self.path!r}, hands={len(self)})"
+
+    def __len__(self):
+        return len(self.__index) + len(self.__extra)
+
+    # function, that returns offset of HAND_START record of hand number.
+    # Raises ValueError, if offset doesn't point to HAND_START record (damaged file or index)
+    def offset(self, number):
+        if number < 0:
+            number += len(self)
+        offset = self.__offset(number)
+        if not self.__starts_hand(offset):
+            raise ValueError(f"History {self.path!r} is damaged: hand {number} has incorrect offset {offset}")
+        return offset
+
+    def __offset(self, number):
+        if number < len(self.__index):
+            return self.__index[number]
+        return self.__extra[number - len(self.__index)]
+
+    def __starts_hand(self, offset):
+        return (offset % RECORD.size == 0 and offset < len(self.__view)
+                and self.__view[offset + KIND_OFFSET] == HAND_START)
+
+    # function, that returns list of records of hand number (tuples, see history.RECORD)
+    def hand(self, number):
+        if number < 0:
+            number += len(self)
+        start = self.offset(number)
+        end = len(self.__view)
+        # damaged offset of the next hand isn't needed: records are read up to HAND_END
+        if number + 1 < len(self):
+            following = self.__offset(number + 1)
+            if following > start and self.__starts_hand(following):
+                end = following
+
+        records = []
+        for record in RECORD.iter_unpack(self.__view[start:end]):
+            records.append(record)
+            if record[1] == HAND_END:
+                break
+        return records
+
+    def __iter__(self):
+        for number in range(len(self)):
+            yield self.hand(number)
+
+    # zero-copy numpy array of all records (fields: hand, kind, seat, a, b, amount)
+    def records(self):
+        if np is None:
+            raise ImportError("numpy is required for array of records")
+        return np.frombuffer(self.__map, dtype=RECORD_DTYPE)
+
+    # function, that counts actions of all hands {action: count}
+    def action_counts(self):
+        if np is not None:
+            records = self.records()
+            counts = np.bincount(records["a"][records["kind"] == ACTION])
+            return {action : int(count) for action, count in enumerate(counts) if count}
+
+        kinds = self.__view[KIND_OFFSET::RECORD.size].tobytes()
+        actions = self.__view[KIND_OFFSET + 2::RECORD.size].tobytes()
+        return dict(Counter(action for kind, action in zip(kinds, actions) if kind == ACTION))
+
+
+    # generator, that reconstructs table of hand number.
+    # Yields pairs (record, table) after applying of every record
+    def replay(self, number):
+        table = None
+
+        for record in self.hand(number):
+            _, kind, seat, a, b, amount = record
+
+            if kind == HAND_START:
+                smallblind_seat, smallblind, players = a, amount, []
+            elif kind == SEAT:
+                players.append(Player(f"Seat {seat}", amount))
+            elif kind == HOLE:
+                if table is None:
+                    table = Table(smallblind, *players)
+                    table.current_smallblind_player = smallblind_seat
+                table.players[seat].cards = [a, b]
+            elif kind == ACTION:
+                _apply_action(table, table.players[seat], a, amount)
+            elif kind == BOARD:
+                # new round -- answers are reset (like after Table.ask_players)
+                for player in table.players:
+                    player.answer.reset()
+                table.add_table_card(a)
+            elif kind == PAYOUT:
+                table.players[seat].stack += amount
+            elif kind == HAND_END:
+                for player in table.players:
+                    table.ledger.take(player.seat, player.bet)
+                    player.bet = 0
+
+            if table is not None:
+                yield record, table
+
+    # function, that returns table at the end of hand number
+    def final_table(self, number):
+        table = None
+        for _, table in self.replay(number):
+            pass
+        return table
+
+    # function, that evaluates showdown of hand number again (with other evaluate function).
+    # Returns list of pairs (seat, strength) of players, who didn't pass
+    def reevaluate(self, number, evaluate=evaluate):
+        board = []
+        cards = {}
+        passed = set()
+
+        for _, kind, seat, a, b, _ in self.hand(number):
+            if kind == HOLE:
+                cards[seat] = [a, b]
+            elif kind == BOARD:
+                board.append(a)
+            elif kind == ACTION and a == FOLD:
+                passed.add(seat)
+
+        return [(seat, evaluate(board + hand)) for seat, hand in cards.items() if seat not in passed]
+
+
+# function, that applies recorded action to player
+def _apply_action(table, player, action, amount):
+    if action == FOLD:
+        player.do_pass(table)
+    elif action in (CHECK, CALL):
+        player.do_check(table)
+    elif action == ALL_IN and amount == player.stack:
+        player.do_raise(table, all_in=True)
+    elif action in (RAISE, ALL_IN):
+        player.do_raise(table, amount)
+    elif action == SMALL_BLIND:
+        player.do_raise(table, amount, sb=True)
+    elif action == BIG_BLIND:
+        player.do_raise(table, amount, bb=True)
@@ -0,0 +1,376 @@
+"""
+    Module, that checks fast algorithms of the game against brute force.
+
+    Reference evaluator doesn't use tables of evaluator module: it ranks every
+    5-card subset of hand directly and takes the best one. Checks:
+    - evaluate, HandState and Player.find_combination on random 5-7 card hands
+      give exactly the same (combination, values) as reference
+    - evaluate_batch (if numpy is installed) gives the same strengths as evaluate
+    - counts of combinations of all 2598960 5-card hands are well-known numbers
+    - outs (see outs module) of random flop and turn spots are the same as
+      found by evaluating every card and every run-out
+    - ICM equities (see icm module) of random stacks are the same as sums over
+      all finishing orders
+    - canonical forms (see canonical module): 1755 flops and 169 starting hands,
+      spots with renamed suits get the same form, strength isn't changed
+    - settlement of bank (Ledger.side_pots and Table.pay_winners) gives the same
+      stacks as splitting every level of contributions separately: many-way
+      all-ins with different stacks, passed players with chips above the last
+      level of not passed players, ties with odd chips (they go from the small
+      blind clockwise) and random spots
+
+    Run: python selfcheck.py [--hands 20000] [--spots 200] [--seed 1] [--skip-exhaustive]
+    Exit code 1, if any check fails.
+"""
+
+import sys
+import random
+import argparse
+from collections import Counter
+from itertools import combinations, permutations
+
+# simulation imports table, which must be imported before player
+from simulation import HeadlessTable, Bot, CallStrategy
+from card import SUITS, SUIT_BITS, SUIT_MASK, DECK_SIZE, make_card
+from evaluator import evaluate, unpack, combination_id, HandState, np, COMBINATION_SHIFT
+from outs import outs
+from icm import icm_exact
+from canonical import PERMUTATIONS, canonicalize, canonical_key, apply, inverse
+
+if np is not None:
+    from evaluator import evaluate_batch
+
+# counts of combinations of all 5-card hands
+FIVE_CARD_COUNTS = {
+    10 : 4,
+    9 : 36,
+    8 : 624,
+    7 : 3744,
+    6 : 5108,
+    5 : 10200,
+    4 : 54912,
+    3 : 123552,
+    2 : 1098240,
+    1 : 1302540,
+    }
+
+
+# function, that returns (combination id, values) of exactly 5 cards
+def reference_five(cards):
+    values = sorted(((card >> SUIT_BITS) + 2 for card in cards), reverse=True)
+    flush = len({card & SUIT_MASK for card in cards}) == 1
+
+    high = 0
+    if len(set(values)) == 5:
+        if values[0] - values[4] == 4:
+            high = values[0]
+        elif values == [14, 5, 4, 3, 2]:
+            high = 5
+
+    if flush and high:
+        return (10, [14]) if high == 14 else (9, [high])
+
+    # values by count of repetitions, then by value
+    counts = Counter(values)
+    groups = sorted(counts, key=lambda value: (counts[value], value), reverse=True)
+    shape = sorted(counts.values(), reverse=True)
+
+    if shape[0] == 4:
+        return 8, groups
+    if shape[:2] == [3, 2]:
+        return 7, groups
+    if flush:
+        return 6, values
+    if high:
+        return 5, [high]
+    if shape[0] == 3:
+        return 4, groups
+    if shape[:2] == [2, 2]:
+        return 3, groups
+    if shape[0] == 2:
+        return 2, groups
+    return 1, values
+
+
+# function, that returns (combination id, values) of the best 5 cards of 5-7 cards
+def reference(cards):
+    return max(reference_five(five) for five in combinations(cards, 5))
+
+
+# function, that checks random hands, returns list of messages about mismatches
+def check_random(hands=20000, seed=1):
+    rng = random.Random(seed)
+    player = Bot("check", 0, CallStrategy())
+    errors = []
+
+    for _ in range(hands):
+        cards = rng.sample(range(DECK_SIZE), rng.randint(5, 7))
+        expected = reference(cards)
+        strength = evaluate(cards)
+
+        if unpack(strength) != expected:
+            errors.append(f"evaluate{cards}: {unpack(strength)} != {expected}")
+        if HandState(cards).strength() != strength:
+            errors.append(f"HandState{cards}: {HandState(cards).strength()} != {strength}")
+        if player.find_combination(cards).key != strength:
+            errors.append(f"find_combination{cards}: {player.combination.key} != {strength}")
+
+    if np is not None:
+        batch = np.array([rng.sample(range(DECK_SIZE), 7) for _ in range(hands)])
+        strengths = evaluate_batch(batch)
+        for cards, strength in zip(batch.tolist(), strengths.tolist()):
+            if strength != evaluate(cards):
+                errors.append(f"evaluate_batch{cards}: {strength} != {evaluate(cards)}")
+
+    return errors
+
+
+# function, that checks counts of combinations of all 5-card hands
+def check_exhaustive():
+    if np is not None:
+        hands = np.array(list(combinations(range(DECK_SIZE), 5)), dtype=np.intp)
+        ids = evaluate_batch(hands) >> COMBINATION_SHIFT
+        counts = dict(enumerate(np.bincount(ids, minlength=11).tolist()))
+    else:
+        counts = Counter(combination_id(evaluate(hand)) for hand in combinations(range(DECK_SIZE), 5))
+
+    return [f"combination {combination}: {counts.get(combination, 0)} hands, expected {count}"
+            for combination, count in FIVE_CARD_COUNTS.items() if counts.get(combination, 0) != count]
+
+
+# function, that checks outs of random spots (2-3 players on the flop or the turn)
+def check_outs(spots=200, seed=1):
+    rng = random.Random(seed)
+    errors = []
+
+    for _ in range(spots):
+        players = rng.randint(2, 3)
+        cards = rng.sample(range(DECK_SIZE), 2 * players + rng.randint(3, 4))
+        hands = [cards[2 * index:2 * index + 2] for index in range(players)]
+        board = cards[2 * players:]
+        deck = [card for card in range(DECK_SIZE) if card not in cards]
+
+        # player, who has the best hand alone (None -- tie)
+        def leader(run_out):
+            strengths = [evaluate(board + hand + list(run_out)) for hand in hands]
+            best = max(strengths)
+            return strengths.index(best) if strengths.count(best) == 1 else None
+
+        run_outs = list(combinations(deck, 5 - len(board)))
+        next_leaders = [leader([card]) for card in deck]
+        river_leaders = [leader(run_out) for run_out in run_outs]
+
+        for index, (hand, result) in enumerate(zip(hands, outs(hands, board))):
+            current = combination_id(evaluate(board + hand))
+            improving = [card for card in deck if combination_id(evaluate(board + hand + [card])) > current]
+            leading = [card for card, player in zip(deck, next_leaders) if player == index]
+            river_improve = sum(1 for run_out in run_outs
+                                if combination_id(evaluate(board + hand + list(run_out))) > current) / len(run_outs)
+            river_lead = river_leaders.count(index) / len(run_outs)
+
+            if (result.improving, result.leading) != (improving, leading) or \
+               abs(result.river_improve - river_improve) > 1e-12 or abs(result.river_lead - river_lead) > 1e-12:
+                errors.append(f"outs({hands}, {board})[{index}]: {result!r}")
+
+    return errors
+
+
+# function, that returns ICM equities by summing probabilities of all finishing orders
+def reference_icm(stacks, payouts):
+    equities = [0.0] * len(stacks)
+    alive = [index for index, stack in enumerate(stacks) if stack > 0]
+    busted = [index for index, stack in enumerate(stacks) if stack <= 0]
+    payouts = list(payouts) + [0] * len(stacks)
+
+    for order in permutations(alive):
+        probability = 1.0
+        rest = sum(stacks[index] for index in alive)
+        for index in order:
+            probability *= stacks[index] / rest
+            rest -= stacks[index]
+        for place, index in enumerate(order):
+            equities[index] += probability * payouts[place]
+
+    # busted players split prizes of the last places
+    for index in busted:
+        equities[index] = sum(payouts[len(alive):len(stacks)]) / len(busted)
+    return equities
+
+
+# function, that checks ICM of random stacks (up to 7 players, some of them busted)
+def check_icm(spots=200, seed=1):
+    rng = random.Random(seed)
+    errors = []
+
+    for _ in range(spots):
+        players = rng.randint(2, 7)
+        stacks = [0 if rng.random() < 0.1 else rng.randint(1, 10000) for _ in range(players)]
+        payouts = sorted((rng.randint(0, 1000) for _ in range(rng.randint(1, players))), reverse=True)
+
+        expected = reference_icm(stacks, payouts)
+        result = icm_exact(stacks, payouts)
+        if any(abs(first - second) > 1e-6 for first, second in zip(result, expected)):
+            errors.append(f"icm_exact({stacks}, {payouts}): {result} != {expected}")
+
+    return errors
+
+
+# function, that checks canonical forms: counts of classes and random spots
+def check_canonical(spots=200, seed=1):
+    errors = []
+
+    flops = len({canonical_key(flop) for flop in combinations(range(DECK_SIZE), 3)})
+    hands = len({canonical_key(hand) for hand in combinations(range(DECK_SIZE), 2)})
+    if (flops, hands) != (1755, 169):
+        errors.append(f"canonical classes: {flops} flops, {hands} hands, expected 1755 and 169")
+
+    rng = random.Random(seed)
+    for _ in range(spots):
+        cards = rng.sample(range(DECK_SIZE), rng.randint(5, 7))
+        hand, board = cards[:2], cards[2:]
+        (canonical_hand, canonical_board), permutation = canonicalize(hand, board)
+
+        # the same spot with renamed suits
+        renamed = rng.choice(PERMUTATIONS)
+        if canonical_key(apply(hand, renamed), apply(board, renamed)) != (canonical_hand, canonical_board):
+            errors.append(f"canonical_key({hand}, {board}) depends on names of suits")
+        if sorted(apply(canonical_hand, inverse(permutation))) != sorted(hand) or \
+           sorted(apply(canonical_board, inverse(permutation))) != sorted(board):
+            errors.append(f"canonicalize({hand}, {board}) isn't inverted by its permutation")
+        if evaluate(list(canonical_hand + canonical_board)) != evaluate(cards):
+            errors.append(f"canonicalize({hand}, {board}) changes strength")
+
+    return errors
+
+
+# function, that returns payouts of bank by seats: every level of contributions is
+# split separately between not passed players, who put this level, levels with
+# the same players make one pot, chips above the last level of not passed players
+# go to the last pot. Odd chips of pot go to winners from the small blind clockwise
+def reference_payouts(bets, folded, strengths, smallblind):
+    seats = len(bets)
+    pots = []
+    previous = 0
+    for level in sorted(set(bets) - {0}):
+        amount = (level - previous) * sum(1 for bet in bets if bet >= level)
+        contenders = [seat for seat in range(seats) if bets[seat] >= level and not folded[seat]]
+        if pots and (not contenders or contenders == pots[-1][1]):
+            pots[-1][0] += amount
+        else:
+            pots.append([amount, contenders])
+        previous = level
+
+    payouts = [0] * seats
+    for amount, contenders in pots:
+        best = max(strengths[seat] for seat in contenders)
+        winners = sorted((seat for seat in contenders if strengths[seat] == best),
+                         key=lambda seat: (seat - smallblind) % seats)
+        for index, seat in enumerate(winners):
+            payouts[seat] += amount // len(winners) + (1 if index < amount % len(winners) else 0)
+    return payouts
+
+
+# function, that settles one spot by table, returns list of messages about mismatches.
+# cards -- 2 cards of every player, then 5 table cards
+def check_settlement_spot(stacks, bets, folded, cards, smallblind):
+    players = [Bot(f"Player {seat}", stack, CallStrategy()) for seat, stack in enumerate(stacks)]
+    table = HeadlessTable(1, *players)
+    board = cards[2 * len(players):]
+
+    for seat, player in enumerate(players):
+        player.cards = cards[2 * seat:2 * seat + 2]
+        if bets[seat]:
+            player.do_raise(table, bets[seat])
+        if folded[seat]:
+            player.do_pass(table)
+    for card in board:
+        table.add_table_card(card)
+    # after pre-flop current_smallblind_player is the big blind
+    table.current_smallblind_player = (smallblind + 1) % len(players)
+
+    pots = table.ledger.side_pots()
+    table.pay_winners()
+
+    strengths = [evaluate(cards[2 * seat:2 * seat + 2] + board) for seat in range(len(players))]
+    payouts = reference_payouts(bets, folded, strengths, smallblind)
+    expected = [stack - bet + payout for stack, bet, payout in zip(stacks, bets, payouts)]
+    result = [player.stack for player in players]
+
+    if result != expected or table.ledger.total != 0:
+        return [f"pay_winners(bets={bets}, folded={folded}, cards={cards}, smallblind={smallblind}): "
+                f"stacks {result} != {expected}, pots {pots}"]
+    return []
+
+
+# function, that checks settlement of bank: fixed spots and random ones (2-9 players)
+def check_settlement(spots=200, seed=1):
+    rng = random.Random(seed)
+    errors = []
+
+    # 9-way all-in with different stacks -- 9 pots
+    stacks = [100 * (seat + 1) for seat in range(9)]
+    for _ in range(10):
+        errors += check_settlement_spot(stacks, stacks, [False] * 9, rng.sample(range(DECK_SIZE), 23), rng.randrange(9))
+
+    # passed player has chips above the last level of not passed players
+    for _ in range(10):
+        errors += check_settlement_spot([1000, 300, 200, 500], [800, 300, 200, 100], [True, False, False, True],
+                                        rng.sample(range(DECK_SIZE), 13), rng.randrange(4))
+
+    # 3-way tie (royal flush on the table) with 1 or 2 odd chips, every position of small blind
+    board = [make_card(SUITS[0], value) for value in range(10, 15)]
+    deck = [card for card in range(DECK_SIZE) if card not in board]
+    for odd in (1, 2):
+        for smallblind in range(4):
+            cards = rng.sample(deck, 8) + board
+            errors += check_settlement_spot([1000] * 4, [100, odd, 100, 100], [False, True, False, False],
+                                            cards, smallblind)
+
+    for _ in range(spots):
+        players = rng.randint(2, 9)
+        stacks = [rng.randint(1, 1000) for _ in range(players)]
+        folded = [rng.random() < 0.3 for _ in range(players)]
+        folded[rng.randrange(players)] = False
+        # all-in, part of stack or nothing (only passed players)
+        bets = [stack if rng.random() < 0.5 else rng.randint(0 if passed else 1, stack)
+                for stack, passed in zip(stacks, folded)]
+        errors += check_settlement_spot(stacks, bets, folded, rng.sample(range(DECK_SIZE), 2 * players + 5),
+                                        rng.randrange(players))
+
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check of hand evaluator against brute force")
+    parser.add_argument("--hands", type=int, default=20000, help="count of random hands")
+    parser.add_argument("--spots", type=int, default=200, help="count of random spots for outs, ICM, canonical forms and settlement")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--skip-exhaustive", action="store_true", help="don't count all 5-card hands")
+    args = parser.parse_args(argv)
+
+    errors = check_random(args.hands, args.seed)
+    print(f"random hands: {args.hands}, mismatches: {len(errors)}")
+    mismatches = check_outs(args.spots, args.seed)
+    print(f"outs of random spots: {args.spots}, mismatches: {len(mismatches)}")
+    errors += mismatches
+    mismatches = check_icm(args.spots, args.seed)
+    print(f"ICM of random stacks: {args.spots}, mismatches: {len(mismatches)}")
+    errors += mismatches
+    mismatches = check_canonical(args.spots, args.seed)
+    print(f"canonical forms: {args.spots} spots, mismatches: {len(mismatches)}")
+    errors += mismatches
+    mismatches = check_settlement(args.spots, args.seed)
+    print(f"settlement of bank: {args.spots} random spots, mismatches: {len(mismatches)}")
+    errors += mismatches
+    if not args.skip_exhaustive:
+        mismatches = check_exhaustive()
+        print(f"all 5-card hands: {'ok' if not mismatches else 'mismatches: ' + str(len(mismatches))}")
+        errors += mismatches
+
+    for error in errors[:20]:
+        print("  " + error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+    Module, that defines asyncio table server and client.
+
+    Every seat is a client connection (TCP or Unix socket), one event loop
+    hosts many tables. Messages are JSON objects, one per line.
+
+    Client -> server:
+    - {"type": "join", "name": "Vasya", "table": "main"} -- the first message
+    - {"type": "action", "action": "pass" | "check" | "raise" | "all_in", "value": 100}
+      -- answer to "ask" message ("value" only for "raise")
+
+    Server -> client:
+    - welcome -- seat was taken, table starts when all seats are taken
+    - start -- players of the table
+    - cards -- hole cards (sent only to their owner)
+    - state -- round, table cards, bank and players (before every answer)
+    - ask -- your move (to_call, stack, bet); error -- incorrect answer, ask again
+    - showdown -- winners and stacks; cards of players, who didn't pass, only if
+      two or more of them reached showdown (uncontested winner doesn't show cards)
+    - busted, end -- player has lost / match is over
+
+    Run: python server.py serve [--port 8765 | --unix path] [--seats 3]
+         python server.py join NAME [--table main] [--port 8765 | --unix path] [--bot]
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+
+from table import Table, OnePlayerException
+from player import Player, IncorrectInputException
+from card import card_name
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class Connection:
+    """
+       Class, that sends and receives messages (JSON lines) of one client
+    """
+
+    def __init__(self, reader, writer):
+        self.__reader = reader
+        self.__writer = writer
+        self.closed = False
+
+    async def send(self, **message):
+        if self.closed:
+            return
+        try:
+            self.__writer.write(json.dumps(message).encode() + b"\n")
+            await self.__writer.drain()
+        except OSError:
+            self.closed = True
+
+    # returns message (dict) or None, if connection is closed.
+    # Too long line (over limit of stream) closes connection
+    async def receive(self):
+        if self.closed:
+            return None
+        try:
+            line = await self.__reader.readline()
+        except ValueError:
+            self.closed = True
+            self.__writer.close()
+            return None
+        except OSError:
+            line = b""
+        if not line:
+            self.closed = True
+            return None
+
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return {}
+        return message if isinstance(message, dict) else {}
+
+    async def close(self):
+        self.closed = True
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except OSError:
+            pass
+
+
+class RemotePlayer(Player):
+    """
+       Player, who answers through connection
+    """
+
+    def __init__(self, name, stack, connection):
+        super().__init__(name, stack)
+        self.connection = connection
+
+    # function, that applies answer (message) of client
+    def apply(self, table, message):
+        action = message.get("action")
+
+        if action == "pass":
+            self.do_pass(table)
+        elif action == "check":
+            self.do_check(table)
+        elif action == "all_in":
+            self.do_raise(table, all_in=True)
+        elif action == "raise":
+            try:
+                value = int(message.get("value"))
+            except (TypeError, ValueError):
+                raise IncorrectInputException("Incorrect value for bet...")
+            self.do_raise(table, value)
+        else:
+            raise IncorrectInputException("Incorrect input value...")
+
+    # function, that asks client until correct answer.
+    # Player passes, if client is disconnected or doesn't answer in timeout seconds
+    async def ask_remote(self, table, timeout=None):
+        while True:
+            await self.connection.send(type="ask", to_call=table.call_value(self), stack=self.stack, bet=self.bet)
+            try:
+                message = await asyncio.wait_for(self.connection.receive(), timeout)
+            except asyncio.TimeoutError:
+                message = None
+
+            if message is None:
+                self.do_pass(table)
+                return
+
+            try:
+                self.apply(table, message)
+            except IncorrectInputException as error:
+                await self.connection.send(type="error", message=str(error))
+            else:
+                return
+
+
+class ServerTable(Table):
+    """
+       Table of remote players. Hands are played by coroutine play()
+    """
+
+    def __init__(self, smallblind, *players, action_timeout=60, **kwargs):
+        super().__init__(smallblind, *players, **kwargs)
+        self.action_timeout = action_timeout
+        self.connected = list(players)      # all players of match (also kicked ones)
+
+    def print_info(self, round):
+        pass
+
+    def state(self, round, turn=None):
+        return {
+            "type" : "state",
+            "round" : round,
+            "board" : [card_name(card) for card in self.table_cards],
+            "bank" : self.ledger.total,
+            "turn" : turn,
+            "players" : [{"name" : player.name, "seat" : player.seat, "stack" : player.stack,
+                          "bet" : player.bet, "answer" : str(player.answer)} for player in self.players],
+        }
+
+    async def broadcast(self, **message):
+        await asyncio.gather(*(player.connection.send(**message) for player in self.connected))
+
+
+    async def ask_players_async(self, round):
+        for player in self.players_to_ask():
+            await self.broadcast(**self.state(round, player.name))
+            await player.ask_remote(self, self.action_timeout)
+
+        # reset answers for next row
+        for player in self.players:
+            player.answer.reset()
+
+    async def show_winner_async(self):
+        players = list(self.players)
+        shown = [player for player in players if player.answer.passed != True]
+        if len(shown) < 2:
+            shown = []          # cards of uncontested winner stay private
+        winners_list = self.pay_winners()
+
+        await self.broadcast(
+            type="showdown",
+            board=[card_name(card) for card in self.table_cards],
+            players=[{"name" : player.name, "cards" : [card_name(card) for card in player.cards],
+                      "combination" : str(player.combination)}
+                     for player in shown],
+            winners=[winner.name for winner in winners_list],
+            stacks={player.name : player.stack for player in players})
+
+        self.kick_players()
+        for player in players:
+            if player.stack == 0:
+                await player.connection.send(type="busted")
+
+
+    # coroutine, that plays hands until one player stays (or all clients are disconnected)
+    async def play(self):
+        await self.broadcast(type="start", players=[{"name" : player.name, "seat" : player.seat,
+                                                     "stack" : player.stack} for player in self.players])
+        winner = None
+
+        while not all(player.connection.closed for player in self.players):
+            try:
+                self.pre_flop()
+            except OnePlayerException as exception:
+                winner = exception.player
+                break
+
+            # private cards -- only to owner
+            for player in self.players:
+                await player.connection.send(type="cards", cards=[card_name(card) for card in player.cards])
+            await self.ask_players_async("pre-flop")
+
+            for round, deal in (("flop", self.flop), ("turn", self.turn), ("river", self.river)):
+                deal()
+                await self.ask_players_async(round)
+
+            await self.show_winner_async()
+            self.reset_table()
+
+        await self.broadcast(type="end", winner=winner.name if winner else None,
+                             stack=winner.stack if winner else None)
+        for player in self.connected:
+            await player.connection.close()
+
+
+class TableServer:
+    """
+       Class, that seats clients to tables. Table starts, when all its seats
+       are taken; the next clients of the same table name wait for a new one
+    """
+
+    def __init__(self, seats=3, stack=1500, smallblind=50, action_timeout=60):
+        self.seats = seats
+        self.stack = stack
+        self.smallblind = smallblind
+        self.action_timeout = action_timeout
+        self.tables = set()         # tasks of playing tables
+        self.__waiting = {}         # table name: [players]
+
+    async def handle(self, reader, writer):
+        connection = Connection(reader, writer)
+
+        message = await connection.receive()
+        if not message or message.get("type") != "join" or not message.get("name"):
+            await connection.send(type="error", message="The first message must be join with name")
+            await connection.close()
+            return
+
+        name = str(message.get("table", "main"))
+        players = self.__waiting.setdefault(name, [])
+        players.append(RemotePlayer(str(message["name"]), self.stack, connection))
+        await connection.send(type="welcome", table=name, seat=len(players) - 1, seats=self.seats)
+
+        if len(players) == self.seats:
+            del self.__waiting[name]
+            table = ServerTable(self.smallblind, *players, action_timeout=self.action_timeout)
+            task = asyncio.create_task(table.play())
+            self.tables.add(task)
+            task.add_done_callback(self.tables.discard)
+
+    # coroutine, that starts server (TCP on host:port or Unix socket on path)
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+        return await asyncio.start_server(self.handle, host, port)
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        server = await self.start(host, port, path)
+        async with server:
+            await server.serve_forever()
+
+
+# Client
+
+# strategy of bot client: always check (call)
+def call_strategy(message):
+    return {"action" : "check"}
+
+
+# function, that prints message of server for human
+def print_message(message):
+    kind = message.get("type")
+
+    if kind == "state":
+        print(f"  {message['round'].upper()}  board: {' '.join(message['board'])}  bank: {message['bank']}")
+        for player in message["players"]:
+            print(f"    {player['name']} (bet:{player['bet']}, stack:{player['stack']})\t-- {player['answer']}")
+    elif kind == "cards":
+        print(f"  Your cards:  {'  '.join(message['cards'])}")
+    elif kind == "showdown":
+        for player in message["players"]:
+            print(f"  {player['name']}: {' '.join(player['cards'])} -- {player['combination']}")
+        print(f"  Winners: {', '.join(message['winners'])}")
+    elif kind == "end":
+        print(f"Player {message['winner']} has won this match with stack {message['stack']}")
+    else:
+        print(f"  {kind}: {message}")
+
+
+# function, that reads answer of human from terminal
+def read_answer(message):
+    print(f"Your move! To call: {message['to_call']}, stack: {message['stack']}")
+    answer = input("'p' -- pass, 'c' -- check (call), 'b VALUE' -- bet, 'a' -- all-in: ").split()
+
+    actions = {"p" : "pass", "c" : "check", "b" : "raise", "a" : "all_in"}
+    action = actions.get(answer[0] if answer else "", "")
+    return {"action" : action, "value" : answer[1] if len(answer) > 1 else None}
+
+
+# coroutine, that plays at the table.
+# strategy -- function (ask message) -> answer, None -- answers are read from terminal
+async def run_client(name, table="main", host=DEFAULT_HOST, port=DEFAULT_PORT, path=None,
+                     strategy=None, output=print_message):
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    connection = Connection(reader, writer)
+
+    await connection.send(type="join", name=name, table=table)
+    result = None
+
+    while True:
+        message = await connection.receive()
+        if message is None:
+            break
+        if output is not None:
+            output(message)
+
+        if message.get("type") == "ask":
+            if strategy is None:
+                answer = await asyncio.get_running_loop().run_in_executor(None, read_answer, message)
+            else:
+                answer = strategy(message)
+            await connection.send(type="action", **answer)
+        elif message.get("type") == "end":
+            result = message
+
+    await connection.close()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poker table server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve")
+    serve.add_argument("--seats", type=int, default=3)
+    serve.add_argument("--stack", type=int, default=1500)
+    serve.add_argument("--smallblind", type=int, default=50)
+    serve.add_argument("--timeout", type=float, default=60)
+
+    join = commands.add_parser("join")
+    join.add_argument("name")
+    join.add_argument("--table", default="main")
+    join.add_argument("--bot", action="store_true", help="always check (call)")
+
+    for command in (serve, join):
+        command.add_argument("--host", default=DEFAULT_HOST)
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+        command.add_argument("--unix", help="path of Unix socket")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = TableServer(args.seats, args.stack, args.smallblind, args.timeout)
+        asyncio.run(server.serve_forever(args.host, args.port, args.unix))
+    else:
+        asyncio.run(run_client(args.name, args.table, args.host, args.port, args.unix,
+                               strategy=call_strategy if args.bot else None))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+    Module, that defines local equity service.
+
+    Service is a long-lived asyncio server (Unix socket or localhost TCP),
+    messages are JSON objects, one per line:
+    - request -- {"id": 1, "hands": ["AsKs", "QdQh"], "board": "2h7dKc", "dead": "", "samples": 20000}
+    - response -- {"id": 1, "results": [[win, tie, equity], ...], "cached": false}
+      or {"id": 1, "error": "..."}
+    - {"id": 2, "type": "stats"} -- counters of cache
+    Request line must be shorter than REQUEST_LIMIT bytes, longer one is answered
+    by {"id": null, "error": "Request is too long"}.
+
+    Concurrent requests are collected into batches (batch_size requests or
+    batch_window seconds), same spots are counted once, batches are split
+    between worker processes. Results are cached (LRU) by canonical forms of
+    spots (see canonical module), so spots, which differ only by suits, share
+    results. Before the flop equity is sampled (with fixed seed, so results
+    don't depend on cache), after it -- counted exactly.
+
+    Run: python service.py serve [--unix path | --port 8766] [--processes N]
+         python service.py query AsKs QdQh [--board 2h7dKc] [--unix path | --port 8766]
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from card import SUIT_BITS, SUIT_MASK, RANK_LETTERS, SUIT_LETTERS, parse_cards
+from canonical import canonicalize
+from equity import monte_carlo, exact, run_out_deck
+from evaluator import np
+
+if np is not None:
+    from evaluator import shared_tables, attach_tables
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8766
+DEFAULT_SAMPLES = 20000
+SEED = 0
+REQUEST_LIMIT = 1 << 16         # limit of line of asyncio stream reader
+
+
+class LRUCache:
+    """
+       Class, that keeps the last used size results
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.__items = OrderedDict()
+
+    def __repr__(self):
+        return f"LRUCache(size={self.size}, items={len(self)})"
+
+    def __len__(self):
+        return len(self.__items)
+
+    # returns value or None
+    def get(self, key):
+        value = self.__items.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.__items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.__items[key] = value
+        self.__items.move_to_end(key)
+        if len(self.__items) > self.size:
+            self.__items.popitem(last=False)
+
+
+# worker function, that counts equities of spots.
+# spots -- [(hands, board, dead, samples)], returns [[(win, tie, equity)] for every spot]
+def solve_batch(spots):
+    answers = []
+    for hands, board, dead, samples in spots:
+        if len(board) >= 3:
+            results = exact(hands, board, dead)
+        else:
+            results = monte_carlo(hands, board, dead, samples=samples, seed=SEED)
+        answers.append([(result.win, result.tie, result.equity) for result in results])
+    return answers
+
+
+class EquityService:
+    """
+       Class, that batches requests, counts them on worker pool and caches results
+    """
+
+    def __init__(self, processes=None, cache_size=100000, batch_size=64, batch_window=0.005):
+        self.processes = processes or os.cpu_count()
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.cache = LRUCache(cache_size)
+        self.batches = 0
+        self.__queue = None
+        self.__pending = {}         # key: future of spot, which is counted now
+        self.__pool = None
+        self.__batcher = None
+        self.__finishing = set()    # tasks, which wait for results of batches
+
+    async def start(self):
+        if np is not None:
+            self.__pool = ProcessPoolExecutor(self.processes, initializer=attach_tables, initargs=(shared_tables(),))
+        else:
+            self.__pool = ProcessPoolExecutor(self.processes)
+        self.__queue = asyncio.Queue()
+        self.__batcher = asyncio.create_task(self.__run_batches())
+
+    async def stop(self):
+        self.__batcher.cancel()
+        self.__pool.shutdown(cancel_futures=True)
+
+
+    # coroutine, that returns list of (win, tie, equity) for hands (lists of ints).
+    # Second value -- True if result was taken from cache
+    async def equity(self, hands, board=(), dead=(), samples=DEFAULT_SAMPLES):
+        hands = [list(hand) for hand in hands]
+        if len(hands) < 2 or any(len(hand) != 2 for hand in hands) or len(board) > 5:
+            raise ValueError("Two or more hands of two cards and 0-5 table cards are needed")
+        if samples < 1:
+            raise ValueError("At least one sample is needed")
+        run_out_deck(board, dead, *hands)           # checks repeated cards and size of the deck
+
+        samples = 1 if len(board) >= 3 else samples
+        groups, _ = canonicalize(*hands, board, dead)
+        key = (groups[:-2], groups[-2], groups[-1], samples)
+
+        result = self.cache.get(key)
+        if result is not None:
+            return result, True
+
+        future = self.__pending.get(key)
+        if future is None:
+            future = self.__pending[key] = asyncio.get_running_loop().create_future()
+            await self.__queue.put(key)
+        return await asyncio.shield(future), False
+
+    async def __run_batches(self):
+        loop = asyncio.get_running_loop()
+        workers = self.processes
+
+        while True:
+            batch = [await self.__queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(await asyncio.wait_for(self.__queue.get(), max(deadline - loop.time(), 0)))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            # batch is split between workers
+            parts = [batch[index::workers] for index in range(min(workers, len(batch)))]
+            futures = [loop.run_in_executor(self.__pool, solve_batch, part) for part in parts]
+            task = asyncio.create_task(self.__finish(parts, futures))
+            self.__finishing.add(task)
+            task.add_done_callback(self.__finishing.discard)
+
+    async def __finish(self, parts, futures):
+        for part, future in zip(parts, futures):
+            try:
+                answers = await future
+            except Exception as error:
+                for key in part:
+                    self.__pending.pop(key).set_exception(error)
+                continue
+
+            for key, answer in zip(part, answers):
+                self.cache.put(key, answer)
+                self.__pending.pop(key).set_result(answer)
+
+    def stats(self):
+        return {"hits" : self.cache.hits, "misses" : self.cache.misses, "items" : len(self.cache),
+                "batches" : self.batches, "pending" : len(self.__pending)}
+
+
+    async def handle(self, reader, writer):
+        lock = asyncio.Lock()
+
+        # message None -- too long request, it's answered by error without id
+        async def answer(message):
+            response = {"id" : message.get("id") if message is not None else None}
+            try:
+                if message is None:
+                    raise ValueError("Request is too long")
+                if message.get("type") == "stats":
+                    response["stats"] = self.stats()
+                else:
+                    hands = [parse_cards(hand) for hand in message["hands"]]
+                    results, cached = await self.equity(hands, parse_cards(message.get("board", "")),
+                                                        parse_cards(message.get("dead", "")),
+                                                        int(message.get("samples", DEFAULT_SAMPLES)))
+                    response.update(results=results, cached=cached)
+            except Exception as error:         # every request gets an answer
+                response["error"] = str(error) or type(error).__name__
+
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        # requests of one connection are answered concurrently (responses have ids)
+        tasks = set()
+        try:
+            while (line := await _read_request(reader)) != b"":
+                try:
+                    message = json.loads(line) if line is not None else None
+                except ValueError:
+                    message = {}
+                if line is not None and not isinstance(message, dict):
+                    message = {}
+                task = asyncio.create_task(answer(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self, host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        await self.start()
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, limit=REQUEST_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=REQUEST_LIMIT)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+# coroutine, that reads line of request. Returns b"" at the end of stream
+# and None for line, which is longer than limit of reader (it's skipped up to newline)
+async def _read_request(reader):
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as error:
+        return error.partial
+    except asyncio.LimitOverrunError as error:
+        consumed = error.consumed
+
+    while True:
+        await reader.readexactly(consumed)
+        try:
+            await reader.readuntil(b"\n")
+            return None
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError as error:
+            consumed = error.consumed
+
+
+# Client
+
+class EquityClient:
+    """
+       Class, that sends requests to service. Requests can be sent concurrently
+    """
+
+    def __init__(self, reader, writer):
+        self.__reader = reader
+        self.__writer = writer
+        self.__futures = {}
+        self.__next_id = 0
+        self.__receiver = asyncio.create_task(self.__receive())
+
+    @staticmethod
+    async def connect(host=DEFAULT_HOST, port=DEFAULT_PORT, path=None):
+        if path is not None:
+            return EquityClient(*await asyncio.open_unix_connection(path))
+        return EquityClient(*await asyncio.open_connection(host, port))
+
+    async def __receive(self):
+        while line := await self.__reader.readline():
+            message = json.loads(line)
+            future = self.__futures.pop(message.get("id"), None)
+            if future is not None:
+                future.set_result(message)
+        for future in self.__futures.values():
+            future.set_exception(ConnectionError("Service closed connection"))
+
+    async def request(self, **message):
+        self.__next_id += 1
+        message["id"] = self.__next_id
+        data = json.dumps(message).encode() + b"\n"
+        if len(data) >= REQUEST_LIMIT:
+            raise ValueError("Request is too long")         # service couldn't answer it by id
+        future = self.__futures[self.__next_id] = asyncio.get_running_loop().create_future()
+
+        self.__writer.write(data)
+        await self.__writer.drain()
+
+        response = await future
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response
+
+    # hands -- texts ("AsKs") or lists of ints, returns list of (win, tie, equity)
+    async def equity(self, hands, board="", dead="", samples=DEFAULT_SAMPLES):
+        response = await self.request(hands=[_text(hand) for hand in hands], board=_text(board),
+                                      dead=_text(dead), samples=samples)
+        return [tuple(result) for result in response["results"]]
+
+    async def stats(self):
+        return (await self.request(type="stats"))["stats"]
+
+    async def close(self):
+        self.__writer.close()
+        self.__receiver.cancel()
+
+
+# function, that converts cards (ints) to text for request
+def _text(cards):
+    if isinstance(cards, str):
+        return cards
+    return "".join(RANK_LETTERS[card >> SUIT_BITS] + SUIT_LETTERS[card & SUIT_MASK] for card in cards)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local equity service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve")
+    serve.add_argument("--processes", type=int)
+    serve.add_argument("--cache", type=int, default=100000, help="count of cached spots")
+
+    query = commands.add_parser("query")
+    query.add_argument("hands", nargs="+")
+    query.add_argument("--board", default="")
+    query.add_argument("--dead", default="")
+    query.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+
+    for command in (serve, query):
+        command.add_argument("--host", default=DEFAULT_HOST)
+        command.add_argument("--port", type=int, default=DEFAULT_PORT)
+        command.add_argument("--unix", help="path of Unix socket")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = EquityService(args.processes, args.cache)
+        asyncio.run(service.serve_forever(args.host, args.port, args.unix))
+        return 0
+
+    async def run_query():
+        client = await EquityClient.connect(args.host, args.port, args.unix)
+        try:
+            return await client.equity(args.hands, args.board, args.dead, args.samples)
+        finally:
+            await client.close()
+
+    for hand, (win, tie, equity) in zip(args.hands, asyncio.run(run_query())):
+        print(f"{hand}\t{equity * 100:.1f}% (win {win * 100:.1f}%, tie {tie * 100:.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
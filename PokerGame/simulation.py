@@ -0,0 +1,141 @@
+"""
+    Module, that defines headless table for simulations without terminal.
+    Players are bots, their answers are given by strategy objects.
+"""
+
+import random
+
+from table import Table, OnePlayerException
+from player import Player, IncorrectInputException
+from evaluator import combination_id
+
+
+class Strategy:
+    """
+        Base class of strategies. Method act must answer for player
+        by calling one of player.do_pass, player.do_check or player.do_raise
+    """
+
+    def act(self, player, table):
+        raise NotImplementedError
+
+
+class CallStrategy(Strategy):
+    """ Always checks or calls """
+
+    def act(self, player, table):
+        player.do_check(table)
+
+
+class RandomStrategy(Strategy):
+    """
+        Passes, raises or calls randomly. Raises only once in a round,
+        so betting rounds are finite.
+    """
+
+    def __init__(self, rng=None, pass_probability=0.1, raise_probability=0.2):
+        self.rng = rng or random.Random()
+        self.pass_probability = pass_probability
+        self.raise_probability = raise_probability
+
+    def act(self, player, table):
+        to_call = table.call_value(player)
+        chance = self.rng.random()
+
+        if to_call > 0 and chance < self.pass_probability:
+            player.do_pass(table)
+        elif chance > 1 - self.raise_probability and not player.answer.raised and player.stack > to_call:
+            player.do_raise(table, min(player.stack, to_call + table.smallblind * 2 * self.rng.randint(1, 5)))
+        else:
+            player.do_check(table)
+
+
+class StrengthStrategy(Strategy):
+    """
+        Plays by strength of hand: raises with pair of tens or better before flop
+        and with two pairs or better after, calls with a pair or high cards
+        before flop and passes weak hands, if it costs something
+    """
+
+    def act(self, player, table):
+        to_call = table.call_value(player)
+
+        if table.table_cards:
+            combination = combination_id(player.hand_state.strength())
+            strong, playable = combination >= 3, combination >= 2
+        else:
+            first, second = sorted(card >> 2 for card in player.cards)
+            strong = first == second and first >= 8         # pair of tens or better
+            playable = first == second or first >= 8
+
+        if strong and not player.answer.raised and player.stack > to_call:
+            player.do_raise(table, min(player.stack, to_call + table.smallblind * 4))
+        elif playable or to_call == 0:
+            player.do_check(table)
+        else:
+            player.do_pass(table)
+
+
+class Bot(Player):
+    """
+        Player, that answers by strategy
+    """
+
+    def __init__(self, name, stack, strategy):
+        super().__init__(name, stack)
+        self.strategy = strategy
+
+    def ask(self, table):
+        self.strategy.act(self, table)
+
+
+class HeadlessTable(Table):
+    """
+        Table without terminal input and output.
+    """
+
+    def print_info(self, round):
+        pass
+
+    def ask_player(self, player, round):
+        try:
+            player.ask(self)
+        except IncorrectInputException:
+            player.do_check(self)   # incorrect answer of strategy -- call
+
+    def show_winner(self):
+        winners_list = self.pay_winners()
+        self.kick_players()
+        return winners_list
+
+    # function, that plays one hand. Raises OnePlayerException, if game is over
+    def play_hand(self):
+        self.pre_flop()
+        self.ask_players("pre-flop")
+
+        self.flop()
+        self.ask_players("flop")
+
+        self.turn()
+        self.ask_players("turn")
+
+        self.river()
+        self.ask_players("river")
+
+        winners_list = self.show_winner()
+        self.reset_table()
+        return winners_list
+
+    # function, that plays hands until one player stays (or count of hands is played).
+    # Returns count of played hands
+    def play(self, hands=None):
+        played = 0
+
+        while hands is None or played < hands:
+            try:
+                self.play_hand()
+            except OnePlayerException:
+                break
+            played += 1
+
+        return played
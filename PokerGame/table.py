@@ -2,7 +2,11 @@
     Module, that defines table object
 """
 from deck import Deck
-from player import IncorrectInputException, Combination
+from ledger import Ledger
+from card import card_name
+from render import Renderer
+from player import IncorrectInputException
+from equity import table_equity
 
 # Exception, which raised if one player are sitting on the table
 class OnePlayerException(Exception):
@@ -39,10 +43,6 @@ def get_char():
 
     return get_char._func()
 
-# function, that clear terminal
-def clear_scr():
-    import os
-    os.system('cls' if os.name == 'nt' else 'clear')
 
 class Table:
     """
@@ -50,18 +50,28 @@ class Table:
        Has attributes:
        - [] : current players
        - [] : table cards
-       - current bank
+       - ledger : current bank by seats
     """
 
-    def __init__(self, smallblind, *players):
+    def __init__(self, smallblind, *players, show_equity=False, rng=None, history=None):
         self.players = list(players)        
         self.table_cards = []        
-        self.deck = Deck()
+        self.deck = Deck(rng)              # rng -- random.Random for reproducible games
         self.current_smallblind_player = 0 # index player
         self.smallblind = smallblind
+        self.show_equity = show_equity     # show live equity of players in print_info
+        self.equity_samples = 20000
+        self.history = history             # HandHistoryWriter or None
+        self.renderer = Renderer()         # redraws only changed lines of terminal
 
-        # 1-answer, 2-player stack, 3-all-in?
-        self.bank = {index : [0, False] for index in range(len(self.players))}             
+        self.ledger = Ledger(len(self.players))
+        self.seat_players()
+
+
+    # function, that gives seats (indexes) to players
+    def seat_players(self):
+        for seat, player in enumerate(self.players):
+            player.seat = seat
     
      
     def pre_flop(self):
@@ -69,138 +79,152 @@ class Table:
         if len(self.players) == 1:
             raise OnePlayerException(player=self.players[0])
 
+        # blinds
+        if self.current_smallblind_player >= len(self.players):
+            self.current_smallblind_player = 0
+
+        if self.history is not None:
+            self.history.start_hand(self.smallblind, self.current_smallblind_player, self.players)
+
         # players cards
         for player in self.players:
             player.cards = [self.deck.pop(), self.deck.pop()]
+            if self.history is not None:
+                self.history.hole(player.seat, player.cards)
 
-        # blinds
-        if self.current_smallblind_player >= len(self.players):
-            self.current_smallblind_player = 0
-        self.players[self.current_smallblind_player].do_raise(self, self.smallblind, sb=True)
+        # player with short stack goes all-in
+        player = self.players[self.current_smallblind_player]
+        player.do_raise(self, min(self.smallblind, player.stack), sb=True)
 
         if self.current_smallblind_player + 1 == len(self.players):
             self.current_smallblind_player = 0
         else:
             self.current_smallblind_player += 1
         
-        self.players[self.current_smallblind_player].do_raise(self, self.smallblind * 2, bb=True)
+        player = self.players[self.current_smallblind_player]
+        player.do_raise(self, min(self.smallblind * 2, player.stack), bb=True)
 
 
     def flop(self):
         # table cards
         for _ in range(3):
-            self.table_cards.append(self.deck.pop()) 
+            self.deal_card()
 
     def turn(self):
         # table cards
-        self.table_cards.append(self.deck.pop())
+        self.deal_card()
 
     def river(self):
         # table cards
-        self.table_cards.append(self.deck.pop())
+        self.deal_card()
+
+    def deal_card(self):
+        self.add_table_card(self.deck.pop())
+        if self.history is not None:
+            self.history.board(self.table_cards[-1])
+
+    # function, that puts card to the table and updates hand states of players
+    def add_table_card(self, card):
+        self.table_cards.append(card)
+        for player in self.players:
+            player.see_card(card)
+
+    # function, that writes answer of player to history (if it's written)
+    def record_action(self, player, action, value=0):
+        if self.history is not None:
+            self.history.action(player.seat, action, value)
 
 
     def print_info(self, round):
-        clear_scr()
+        screen = self.renderer
 
-        print(f"           {round.upper()}")
-        print("  Table cards:  ")
-        for card in self.table_cards:
-            print(f"        {card.short_name}", end="")
-        print()
+        screen.line(f"           {round.upper()}")
+        screen.line("  Table cards:  ")
+        screen.line("".join(f"        {card_name(card)}" for card in self.table_cards))
         
-        bank_sum = 0
-        # find bank value
-        for bank in self.bank.values():
-            bank_sum += bank[0]
-        print(f"  Table bank:    {bank_sum}")
-        print()
-
-        print("  Players answers:  ")
+        screen.line(f"  Table bank:    {self.ledger.total}")
+        screen.line()
+
+        equities = {}
+        if self.show_equity and len([player for player in self.players if player.answer.passed != True]) > 1:
+            equities = {id(player) : result for player, result in table_equity(self, samples=self.equity_samples)}
+
+        screen.line("  Players answers:  ")
         for player in self.players:
-            print(f"    {player.name} (bet:{player.bet})\t-- {player.answer}")
-        print()
+            equity = f"\t(equity: {equities[id(player)]})" if id(player) in equities else ""
+            screen.line(f"    {player.name} (bet:{player.bet})\t-- {player.answer}{equity}")
+        screen.line()
 
+        screen.render()
+
+
+    # function, that returns value, which player must add to call
+    def call_value(self, player):
+        return self.ledger.to_call(player.seat)
+
+
+    # generator of players, who must answer in this round (in order of asking).
+    # It's lazy, so every answer is taken into account before next player
+    def players_to_ask(self):
+        ledger = self.ledger
 
-    def ask_players(self, round):
         # first cycle (ask all players)
-        # return if one player must be asked
-        if len([player for player in self.players if player.answer.passed != True and self.bank[self.players.index(player)][1] != True]) <= 1:
+        # return if nobody must answer (one player can answer and he has called)
+        active = [player for player in self.players if ledger.active(player.seat)]
+        if not active or len(active) == 1 and ledger.to_call(active[0].seat) == 0:
                 return
 
         for player in self.players:
-            if player.answer.passed or self.bank[self.players.index(player)][1]:
+            if not ledger.active(player.seat):
                 continue
 
-            self.print_info(round)
-            
-            ready = False
-            while not ready:
-                print(f"{player.name}, press 'Enter' to continue....")
-                ready = True if get_char() == b"\r" else False
-
-            # output private information
-            print("  Your cards:  ")
-            for card in player.cards:
-                print(f"        {card.short_name}", end="")
-            print()
-            print(f"  Your stack:    {player.stack}")
-            
-            correct_answer = False
-            while not correct_answer:
-                try:
-                    player.ask(self)
-                except IncorrectInputException as error:
-                    print(error)
-                    print("Try again!")
-                else:
-                    correct_answer = True
-        
-        # second cycle (ask players to call if len(set(bank_sum)) != 1) 
-        stack_list = [bank[0] for index, bank in self.bank.items() if self.players[index].answer.passed != True]
+            yield player
         
-        players_list = [player for player in self.players if player.answer.passed != True and \
-            self.bank[self.players.index(player)][1] != True and \
-            player.bet != max(stack_list)]
+        # second cycle (ask players to call while bets are different) 
+        players_list = [player for player in self.players if ledger.active(player.seat) and ledger.to_call(player.seat) > 0]
 
         while len(players_list) > 0:
 
             for player in self.players:
                 # skip asking players with max bet, or passed, or who go all-in
-                if player.answer.passed or \
-                    self.bank[self.players.index(player)][0] == max(stack_list) or \
-                    self.bank[self.players.index(player)][1]:
+                if not ledger.active(player.seat) or ledger.to_call(player.seat) == 0:
                     continue
 
-                self.print_info(round)
-            
-                ready = False
-                while not ready:
-                    print(f"{player.name}, press 'Enter' to continue....")
-                    ready = True if get_char() == b"\r" else False
-
-                # output private information
-                print("  Your cards:  ")
-                for card in player.cards:
-                    print(f"        {card.short_name}", end="")
-                print()
-                print(f"  Your stack:    {player.stack}")
-                correct_answer = False
-                while not correct_answer:
-                    try:
-                        player.ask(self)
-                    except IncorrectInputException as error:
-                        print(error)
-                        print("Try again!")
-                    else:
-                        correct_answer = True
-
-            #stack_list = [bank[0] for index, bank in self.bank.items() if bank[1] == False and self.players[index].answer.passed != True]
-            stack_list = [bank[0] for index, bank in self.bank.items() if self.players[index].answer.passed != True]
+                yield player
+
+            players_list = [player for player in self.players if ledger.active(player.seat) and ledger.to_call(player.seat) > 0]
+
+
+    # function, that asks one player at the terminal
+    # (prompts are written under the frame by renderer, which redraws scrolled frame)
+    def ask_player(self, player, round):
+        self.print_info(round)
+        screen = self.renderer
+    
+        ready = False
+        while not ready:
+            screen.below(f"{player.name}, press 'Enter' to continue....")
+            ready = True if get_char() == b"\r" else False
+
+        # output private information
+        screen.below("  Your cards:  ")
+        screen.below("".join(f"        {card_name(card)}" for card in player.cards))
+        screen.below(f"  Your stack:    {player.stack}")
         
-            players_list = [player for player in self.players if player.answer.passed != True and \
-                self.bank[self.players.index(player)][1] != True and \
-                player.bet != max(stack_list)]
+        correct_answer = False
+        while not correct_answer:
+            try:
+                player.ask(self)
+            except IncorrectInputException as error:
+                screen.below(str(error))
+                screen.below("Try again!")
+            else:
+                correct_answer = True
+
+
+    def ask_players(self, round):
+        for player in self.players_to_ask():
+            self.ask_player(player, round)
 
         # reset answers for next row
         for player in self.players:
@@ -208,100 +232,106 @@ class Table:
 
         
     def show_winner(self):
-        # find winners and pay them
+        winners_list = self.pay_winners()
+        self.print_winners(winners_list)
+        self.kick_players()
+
+        input("Press enter to continue.....")
+        self.renderer.scrolled()        # echo of input
 
-        winners_list = []
 
-        bank_sum = 0
-        for bank in self.bank.values():
-            bank_sum += bank[0]
+    # function, that finds winners and pays them. Returns list of winners
+    # Every pot (see Ledger.side_pots) goes to the best players, who can win it.
+    # Odd chips are given one by one to winners from the small blind clockwise
+    def pay_winners(self):
+        winners_list = []
 
         players_alive = [player for player in self.players if player.answer.passed != True]
       
         # calculate combinations
+        keys = {}
         for player in players_alive:
-            player.find_combination(self.table_cards + player.cards)
+            player.find_combination()
+            keys[player.seat] = player.combination.key
+
+        # small blind seat (after pre_flop current_smallblind_player is big blind)
+        first = (self.current_smallblind_player - 1) % len(self.players)
+
+        # everybody passed -- bets are returned
+        if not players_alive:
+            for player in self.players:
+                player.stack += player.bet
+
+                if self.history is not None and player.bet:
+                    self.history.payout(player.seat, player.bet)
 
         # pay players
-        while bank_sum > 0:
-            winners = Combination.find_max(players_alive)
-            
-            # deleting and sorting winners
-            for index in range(len(winners)):
-                if winners[index].bet == 0:
-                    del winners[index]
-
-            winners.sort(key=lambda x: x.bet)
-
-            while winners:
-                #form subbank and delete from bank and player.bet
-                win_bet = winners[0].bet
-                subbank = 0
-                for player in self.players:
-                    player_bet = player.bet
-                    if player_bet > win_bet:
-                        player.bet -= win_bet
-                        self.bank[self.players.index(player)][0] -= win_bet
-                        subbank += win_bet
-                    else:
-                        player.bet = 0
-                        self.bank[self.players.index(player)][0] = 0
-                        subbank += player_bet
-
-                # paid
-                for winner in winners:
-                    winner.stack += subbank // len(winners)
-
-                winners_list.append(winners[0])
-                del players_alive[players_alive.index(winners[0])]
-                del winners[0]
-                
-                
-            # re-calculate bank-sum
-            bank_sum = 0
-            for bank in self.bank.values():
-                bank_sum += bank[0]
-
-        # print info...
-        clear_scr()
-
-        print("  Table cards:  ")
-        for card in self.table_cards:
-            print(f"        {card.short_name}", end="")
-        print()
+        else:
+            for amount, seats in self.ledger.side_pots():
+                best = max(keys[seat] for seat in seats)
+                winners = sorted((seat for seat in seats if keys[seat] == best),
+                                 key=lambda seat: (seat - first) % len(self.players))
+
+                share, odd = divmod(amount, len(winners))
+                for index, seat in enumerate(winners):
+                    winner = self.players[seat]
+                    won = share + (1 if index < odd else 0)
+                    winner.stack += won
+
+                    if self.history is not None:
+                        self.history.payout(seat, won)
+
+                    if winner not in winners_list:
+                        winners_list.append(winner)
+
+        # bank is empty
+        for player in self.players:
+            self.ledger.take(player.seat, player.bet)
+            player.bet = 0
+
+        if self.history is not None:
+            self.history.end_hand()
+
+        return winners_list
+
+
+    def print_winners(self, winners_list):
+        screen = self.renderer
+
+        screen.line("  Table cards:  ")
+        screen.line("".join(f"        {card_name(card)}" for card in self.table_cards))
         
-        bank_sum = 0
-        # find bank value
-        for bank in self.bank.values():
-            bank_sum += bank[0]
-        print(f"  Table bank:    {bank_sum}")
-        print()
+        screen.line(f"  Table bank:    {self.ledger.total}")
+        screen.line()
 
         for player in self.players:
-            print(f"{player.name} cards:  {player.cards[0].short_name}  {player.cards[1].short_name}") 
-            print(f"{player.name} have {player.stack} funds.")
-            print(f"{player.name} answer is {player.answer}.")
-            print()
+            screen.line(f"{player.name} cards:  {card_name(player.cards[0])}  {card_name(player.cards[1])}") 
+            screen.line(f"{player.name} have {player.stack} funds.")
+            screen.line(f"{player.name} answer is {player.answer}.")
+            screen.line()
 
-        print()
+        screen.line()
 
         if len(winners_list) == 1:
-            print(f'Player {winners_list[0].name} win with {winners_list[0].combination}')
+            screen.line(f'Player {winners_list[0].name} win with {winners_list[0].combination}')
         else:
-            print("  Winners:  ")
+            screen.line("  Winners:  ")
             for index, winner in enumerate(winners_list, 1):
-                print(f'{index}. Player {winner.name} win with {winner.combination}')
+                screen.line(f'{index}. Player {winner.name} win with {winner.combination}')
 
-        # kick players with zero stack, if thoose 
-        self.players = list(filter(lambda item: item.stack > 0, self.players))
+        screen.render()
 
-        input("Press enter to continue.....")
+
+    # kick players with zero stack, if thoose 
+    def kick_players(self):
+        self.players = list(filter(lambda item: item.stack > 0, self.players))
 
 
     def reset_table(self):
         self.table_cards = []
-        self.deck = Deck()
-        self.bank = {index : [0, False] for index in range(len(self.players))} 
+        self.deck.reset()
+        self.ledger.reset(len(self.players))
+        self.seat_players()
 
         for player in self.players:
             player.answer.reset()
@@ -0,0 +1,186 @@
+"""
+    Module, that defines multi-table tournament director.
+    Tables are played by headless tables in worker processes, director
+    sends them only compact seats (player id, stack) and gets back new stacks.
+"""
+
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from simulation import HeadlessTable, Bot, CallStrategy
+from icm import icm
+
+BLINDS = (10, 15, 25, 50, 75, 100, 150, 200, 300, 400, 600, 800, 1000, 1500, 2000, 3000, 5000)
+
+# strategies of players in worker process (player id -> strategy), see _init_worker
+_strategies = None
+
+
+def _init_worker(strategies):
+    global _strategies
+    _strategies = strategies
+
+
+# worker function, that plays hands on one table
+# task -- (table id, small blind, [(player id, stack)], index of small blind player, hands, seed)
+# returns (table id, [(player id, stack)], index of small blind player)
+def _play_table(task):
+    table_id, smallblind, seats, smallblind_player, hands, seed = task
+
+    strategies = _strategies or [CallStrategy()]
+    players = [Bot(str(player_id), stack, strategies[player_id % len(strategies)]) for player_id, stack in seats]
+
+    table = HeadlessTable(smallblind, *players, rng=random.Random(seed))
+    table.current_smallblind_player = smallblind_player
+    table.play(hands)
+
+    stacks = {int(player.name) : player.stack for player in table.players}
+    return table_id, [(player_id, stacks.get(player_id, 0)) for player_id, _ in seats], table.current_smallblind_player
+
+
+class TournamentDirector:
+    """
+       Class, that runs tournament on many tables at once.
+       Has attributes:
+       - stacks -- {player id : stack} of players in the game
+       - tables -- {table id : [player ids]}
+       - places -- ids of eliminated players, the first eliminated -- first
+       - level -- index of current level of blinds
+
+       Every level every table plays hands_per_level hands in a worker process,
+       then busted players are eliminated and tables are broken and balanced.
+    """
+
+    def __init__(self, stacks, table_size=9, blinds=BLINDS, hands_per_level=20,
+                 strategies=None, processes=None, seed=None):
+        if len(stacks) < 2:
+            raise ValueError("Tournament needs two players or more")
+
+        self.stacks = dict(enumerate(stacks))
+        self.table_size = table_size
+        self.blinds = blinds
+        self.hands_per_level = hands_per_level
+        self.strategies = strategies
+        self.processes = processes or os.cpu_count()
+        self.rng = random.Random(seed)
+
+        self.places = []
+        self.level = 0
+        self.__buttons = {}         # table id -> index of small blind player
+
+        # seat players round-robin on the minimal count of tables
+        count = -(-len(self.stacks) // table_size)
+        players = list(self.stacks)
+        self.rng.shuffle(players)
+        self.tables = {table_id : players[table_id::count] for table_id in range(count)}
+
+
+    def __repr__(self):
+        return f"TournamentDirector(players={len(self.stacks)}, tables={len(self.tables)}, level={self.level})"
+
+
+    @property
+    def smallblind(self):
+        return self.blinds[min(self.level, len(self.blinds) - 1)]
+
+
+    # function, that makes compact tasks for workers
+    def _tasks(self):
+        return [(table_id, self.smallblind, [(player_id, self.stacks[player_id]) for player_id in players],
+                 self.__buttons.get(table_id, 0), self.hands_per_level, self.rng.getrandbits(64))
+                for table_id, players in self.tables.items()]
+
+
+    # function, that applies results of one table.
+    # Returns ids of busted players (they stay in stacks with stacks at the start of level)
+    def _update(self, table_id, seats, smallblind_player):
+        busted = []
+        for player_id, stack in seats:
+            if stack > 0:
+                self.stacks[player_id] = stack
+            else:
+                busted.append(player_id)
+
+        self.tables[table_id] = [player_id for player_id, stack in seats if stack > 0]
+        self.__buttons[table_id] = smallblind_player
+        return busted
+
+
+    # function, that eliminates busted players of all tables.
+    # Players, who are busted at the same level, are placed by stack at the start of level
+    def _eliminate(self, busted):
+        busted.sort(key=lambda player_id: self.stacks[player_id])
+        for player_id in busted:
+            del self.stacks[player_id]
+            self.places.append(player_id)
+
+
+    # function, that breaks tables, which are not needed, and balances others
+    def balance(self):
+        for table_id in [table_id for table_id, players in self.tables.items() if not players]:
+            del self.tables[table_id]
+            self.__buttons.pop(table_id, None)
+
+        # break the smallest tables, while their players fit to other tables
+        needed = -(-len(self.stacks) // self.table_size)
+        while len(self.tables) > needed:
+            table_id = min(self.tables, key=lambda key: len(self.tables[key]))
+            players = self.tables.pop(table_id)
+            self.__buttons.pop(table_id, None)
+
+            for player_id in players:
+                smallest = min(self.tables, key=lambda key: len(self.tables[key]))
+                self.tables[smallest].append(player_id)
+
+        # move players from the biggest table to the smallest one
+        while True:
+            biggest = max(self.tables, key=lambda key: len(self.tables[key]))
+            smallest = min(self.tables, key=lambda key: len(self.tables[key]))
+            if len(self.tables[biggest]) - len(self.tables[smallest]) <= 1:
+                break
+            self.tables[smallest].append(self.tables[biggest].pop())
+
+
+    # function, that plays one level on all tables (using pool or in this process)
+    def play_level(self, pool=None):
+        tasks = self._tasks()
+
+        if pool is None:
+            _init_worker(self.strategies)
+            results = map(_play_table, tasks)
+        else:
+            results = pool.map(_play_table, tasks)
+
+        busted = []
+        for table_id, seats, smallblind_player in results:
+            busted += self._update(table_id, seats, smallblind_player)
+        self._eliminate(busted)
+
+        self.level += 1
+        if len(self.stacks) > 1:
+            self.balance()
+
+
+    # function, that returns {player id : prize equity} of players in the game (by ICM).
+    # payouts -- prizes of places of tournament, the first place -- first
+    # (busted players have taken the last places already)
+    def equities(self, payouts, **kwargs):
+        players = list(self.stacks)
+        results = icm([self.stacks[player_id] for player_id in players], list(payouts)[:len(players)], **kwargs)
+        return dict(zip(players, results))
+
+
+    # function, that plays tournament until one player stays.
+    # Returns ids of players in order of places (winner -- first)
+    def run(self):
+        if self.processes == 1:
+            while len(self.stacks) > 1:
+                self.play_level()
+        else:
+            with ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                     initargs=(self.strategies,)) as pool:
+                while len(self.stacks) > 1:
+                    self.play_level(pool)
+
+        return list(self.stacks) + list(reversed(self.places))